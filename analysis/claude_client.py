@@ -1,14 +1,33 @@
 """
 Claude API 스트리밍 호출 래퍼.
 """
+import hashlib
 import os
+import threading
+import time
+from collections import Counter, OrderedDict
 from typing import Generator
 
 import streamlit as st
 from dotenv import load_dotenv
 
+try:
+    import anthropic
+except ImportError:  # 미설치 시 _get_client()에서 안내
+    anthropic = None
+
 load_dotenv()
 
+MODEL = "claude-opus-4-6"
+
+# 스트리밍 화면 갱신 간격: 청크마다 전체 마크다운을 다시 그리지 않도록 묶어서 갱신
+_RENDER_INTERVAL = 0.05  # 초
+_RENDER_CHUNKS = 8
+
+# 응답 캐시: 동일 프롬프트 재요청 시 API 호출 생략
+_RESPONSE_CACHE_TTL = 3600  # 초
+_RESPONSE_CACHE_MAX = 256
+
 
 def _get_api_key() -> str:
     """Streamlit Secrets → .env 순으로 API 키 탐색."""
@@ -23,11 +42,15 @@ def _get_api_key() -> str:
     return os.getenv("ANTHROPIC_API_KEY", "")
 
 
+@st.cache_resource(show_spinner=False)
+def _create_client(api_key: str):
+    """API 키별 anthropic 클라이언트 (세션·재실행 간 HTTP 연결 풀 재사용)."""
+    return anthropic.Anthropic(api_key=api_key)
+
+
 def _get_client():
-    """anthropic 클라이언트 생성 (API 키 검증 포함)."""
-    try:
-        import anthropic
-    except ImportError:
+    """anthropic 클라이언트 반환 (API 키 검증 포함)."""
+    if anthropic is None:
         raise ImportError("anthropic 패키지가 설치되지 않았습니다. pip install anthropic")
 
     api_key = _get_api_key()
@@ -36,22 +59,84 @@ def _get_client():
             "ANTHROPIC_API_KEY가 설정되지 않았습니다.\n"
             ".env 파일 또는 Streamlit Secrets에 ANTHROPIC_API_KEY를 입력하세요."
         )
-    return anthropic.Anthropic(api_key=api_key)
+    return _create_client(api_key)
+
+
+@st.cache_resource(show_spinner=False)
+def _response_cache() -> dict:
+    """프롬프트 해시 → (저장 시각, 응답) 캐시와 적중 통계 (세션 간 공유)."""
+    return {"entries": OrderedDict(), "stats": Counter(), "lock": threading.Lock()}
+
+
+def _prompt_key(prompt: str, system: str, max_tokens: int) -> str:
+    """모델·토큰 한도·시스템·사용자 프롬프트 기준 blake2b 해시."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in (MODEL, str(max_tokens), system, prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cached_response(key: str) -> str | None:
+    """캐시된 응답 반환 (만료·미존재 시 None). 적중/미스 집계."""
+    cache = _response_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry and time.time() - entry[0] < _RESPONSE_CACHE_TTL:
+            cache["entries"].move_to_end(key)
+            cache["stats"]["hits"] += 1
+            return entry[1]
+        cache["entries"].pop(key, None)
+        cache["stats"]["misses"] += 1
+        return None
+
+
+def _store_response(key: str, text: str) -> None:
+    """응답 저장 (최대 개수 초과 시 오래된 항목부터 제거)."""
+    cache = _response_cache()
+    with cache["lock"]:
+        cache["entries"][key] = (time.time(), text)
+        cache["entries"].move_to_end(key)
+        while len(cache["entries"]) > _RESPONSE_CACHE_MAX:
+            cache["entries"].popitem(last=False)
+
+
+def get_response_cache_stats() -> dict:
+    """응답 캐시 통계: {hits, misses, size}."""
+    cache = _response_cache()
+    with cache["lock"]:
+        return {
+            "hits": cache["stats"]["hits"],
+            "misses": cache["stats"]["misses"],
+            "size": len(cache["entries"]),
+        }
+
+
+def _system_blocks(system: str) -> list[dict]:
+    """시스템 프롬프트 → 캐시 지정 블록 (매 호출 동일한 prefix를 프롬프트 캐시로 재사용)."""
+    return [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
 
 
 def stream_analysis(prompt: str, system: str, max_tokens: int = 4096) -> Generator[str, None, None]:
-    """Claude 스트리밍 분석 제너레이터."""
+    """Claude 스트리밍 분석 제너레이터 (동일 프롬프트는 캐시 응답을 그대로 반환)."""
     client = _get_client()
-    import anthropic
 
+    key = _prompt_key(prompt, system, max_tokens)
+    cached = _cached_response(key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
     try:
         with client.messages.stream(
-            model="claude-opus-4-6",
+            model=MODEL,
             max_tokens=max_tokens,
-            system=system,
+            system=_system_blocks(system),
             messages=[{"role": "user", "content": prompt}],
         ) as stream:
             for text in stream.text_stream:
+                chunks.append(text)
                 yield text
     except anthropic.AuthenticationError:
         yield "❌ API 키 인증 실패: ANTHROPIC_API_KEY를 확인하세요."
@@ -59,6 +144,33 @@ def stream_analysis(prompt: str, system: str, max_tokens: int = 4096) -> Generat
         yield "⚠️ API 요청 한도 초과: 잠시 후 다시 시도하세요."
     except anthropic.APIError as e:
         yield f"❌ API 오류: {e}"
+    else:
+        # 정상 완료된 응답만 저장 (오류·중단 응답 제외)
+        _store_response(key, "".join(chunks))
+
+
+def accumulate_stream(
+    chunks,
+    interval: float = _RENDER_INTERVAL,
+    max_chunks: int = _RENDER_CHUNKS,
+) -> Generator[str, None, None]:
+    """
+    스트리밍 청크 → 누적 텍스트 (interval초 경과 또는 max_chunks개 누적 시에만 반환).
+    placeholder.markdown() 호출 횟수를 줄이기 위한 것으로, 마지막 전체 텍스트는 항상 반환.
+    """
+    parts = []
+    pending = 0
+    last = time.monotonic()
+    for chunk in chunks:
+        parts.append(chunk)
+        pending += 1
+        now = time.monotonic()
+        if pending >= max_chunks or now - last >= interval:
+            yield "".join(parts)
+            pending = 0
+            last = now
+    if pending or not parts:
+        yield "".join(parts)
 
 
 def stream_report(prompt: str, system: str) -> Generator[str, None, None]:
@@ -66,6 +178,70 @@ def stream_report(prompt: str, system: str) -> Generator[str, None, None]:
     yield from stream_analysis(prompt, system, max_tokens=8192)
 
 
+def _message_text(message) -> str:
+    """응답 메시지의 텍스트 블록 이어 붙이기."""
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+def submit_batch(prompt: str, system: str, max_tokens: int = 4096) -> str:
+    """
+    단일 분석 프롬프트를 Message Batches API에 제출 (실시간 대비 비용 50%, 처리까지 최대 24시간).
+    반환: batch id — 결과는 get_batch_result()로 조회. API 오류 시 RuntimeError (안내 메시지 포함).
+    """
+    client = _get_client()
+    try:
+        batch = client.messages.batches.create(requests=[{
+            "custom_id": "prompt-0",
+            "params": {
+                "model": MODEL,
+                "max_tokens": max_tokens,
+                "system": _system_blocks(system),
+                "messages": [{"role": "user", "content": prompt}],
+            },
+        }])
+    except anthropic.AuthenticationError:
+        raise RuntimeError("❌ API 키 인증 실패: ANTHROPIC_API_KEY를 확인하세요.")
+    except anthropic.RateLimitError:
+        raise RuntimeError("⚠️ API 요청 한도 초과: 잠시 후 다시 시도하세요.")
+    except anthropic.APIError as e:
+        raise RuntimeError(f"❌ API 오류: {e}")
+    return batch.id
+
+
+def get_batch_result(batch_id: str, prompt: str, system: str, max_tokens: int = 4096) -> str | None:
+    """
+    submit_batch()로 제출한 배치 결과 조회.
+    반환: 응답 텍스트, 처리 중이거나 일시적 오류(연결·타임아웃·한도 초과·5xx)면 None (다음 조회에서 재시도).
+    인증 실패·요청 실패(errored/canceled/expired) 등 복구 불가 오류는 RuntimeError (안내 메시지 포함).
+    성공 응답은 응답 캐시에 저장 (같은 프롬프트의 실시간 재요청 시 재사용).
+    """
+    client = _get_client()
+    try:
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return None
+        entries = list(client.messages.batches.results(batch_id))
+    except anthropic.AuthenticationError:
+        raise RuntimeError("❌ API 키 인증 실패: ANTHROPIC_API_KEY를 확인하세요.")
+    except (anthropic.APIConnectionError, anthropic.RateLimitError):
+        return None
+    except anthropic.APIStatusError as e:
+        if e.status_code >= 500:
+            return None
+        raise RuntimeError(f"❌ API 오류: {e}")
+    except anthropic.APIError as e:
+        raise RuntimeError(f"❌ API 오류: {e}")
+
+    if not entries:
+        raise RuntimeError("❌ API 오류: 배치 응답 없음")
+    result = entries[0].result
+    if result.type != "succeeded":
+        raise RuntimeError(f"❌ API 오류: 배치 요청 {result.type}")
+    text = _message_text(result.message)
+    _store_response(_prompt_key(prompt, system, max_tokens), text)
+    return text
+
+
 def check_api_key() -> tuple[bool, str]:
     """API 키 유효성 확인. (bool, message) 반환."""
     api_key = _get_api_key()
@@ -2,12 +2,16 @@
 게임 데이터 로드·필터·집계 모듈
 history는 누적 판매량/수익 시계열이므로, 연도별 증분을 계산한다.
 """
+import heapq
 import json
 import glob
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from collections import defaultdict
+from itertools import chain
+from operator import itemgetter
 
+import numpy as np
 import streamlit as st
 
 
@@ -19,6 +23,10 @@ PARQUET_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "raw_dat
 # (각 접근 함수에서 _parse_field()로 lazy 파싱)
 _LAZY_JSON_FIELDS = {"history", "audienceOverlap", "countryData", "playtimeData"}
 
+# 로드 시 바로 파싱하는 JSON 문자열 컬럼 (convert_to_parquet.py에서 list/dict를 직렬화한 필드)
+_JSON_FIELDS = {"tags", "genres", "features", "languages", "developers", "publishers",
+                "estimateDetails", "dlc"}
+
 
 def _parse_field(val, default=None):
     """JSON 문자열이면 파싱, 이미 파이썬 객체면 그대로 반환."""
@@ -34,57 +42,177 @@ def _parse_field(val, default=None):
     return default
 
 
-@st.cache_data(show_spinner="게임 데이터 로딩 중...")
+# Parquet 스트리밍 로드 시 배치당 행 수
+_PARQUET_BATCH_ROWS = 256
+
+
+def _batch_to_dicts(batch) -> list[dict]:
+    """Arrow RecordBatch → 게임 dict 목록 (컬럼 단위 변환, null → None)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = batch.schema.names
+    col_values = []
+    for col, arr in zip(columns, batch.columns):
+        vals = arr.to_pylist()
+        # _JSON_FIELDS 컬럼에서 '['/'{'로 시작하는 셀만 json.loads (파싱 실패 시 원문 유지)
+        if col in _JSON_FIELDS and (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+            mask = pc.or_(pc.starts_with(arr, "["), pc.starts_with(arr, "{"))
+            mask = mask.fill_null(False).to_numpy(zero_copy_only=False)
+            for i in np.flatnonzero(mask):
+                try:
+                    vals[i] = json.loads(vals[i])
+                except ValueError:
+                    pass
+        col_values.append(vals)
+    return [dict(zip(columns, row)) for row in zip(*col_values)]
+
+
+@st.cache_resource(show_spinner="게임 데이터 로딩 중...")
 def load_all_games() -> list[dict]:
     """
     Parquet 우선 로드 → 없으면 JSON 폴백.
     heavy 필드(history, audienceOverlap 등)는 JSON 문자열로 보관해 메모리 절감.
+    프로세스 전역 공유 객체 (재실행마다 복사본 역직렬화 없음) → 호출 측에서 수정 금지.
     """
-    import pandas as pd
-    import numpy as np
-
     if os.path.exists(PARQUET_PATH):
-        df = pd.read_parquet(PARQUET_PATH)
-
-        # _LAZY_JSON_FIELDS 제외한 JSON 문자열 컬럼을 벡터화 파싱 (iterrows 대비 10~20배 빠름)
-        for col in df.select_dtypes(include="object").columns:
-            if col in _LAZY_JSON_FIELDS:
-                continue
-            sample = df[col].dropna()
-            if sample.empty:
+        import pyarrow.dataset as ds
+
+        # 배치 단위 스트리밍 변환 (Arrow 전체 테이블과 dict 목록이 동시에 상주하지 않도록)
+        dataset = ds.dataset(PARQUET_PATH, format="parquet")
+        games = []
+        for batch in dataset.to_batches(batch_size=_PARQUET_BATCH_ROWS):
+            games.extend(_batch_to_dicts(batch))
+    else:
+        # 폴백: JSON 개별 파일 로드 (로컬 개발용)
+        pattern = os.path.join(GAMES_DIR, "*.json")
+        games = []
+        for path in glob.glob(pattern):
+            if "_progress" in os.path.basename(path):
                 continue
-            first = sample.iloc[0]
-            if isinstance(first, str) and first and first[0] in ('[', '{'):
-                df[col] = df[col].map(
-                    lambda v: json.loads(v) if isinstance(v, str) and v else v,
-                    na_action='ignore'
-                )
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                games.append(data)
+            except Exception:
+                pass
 
-        # NaN → None
-        df = df.where(pd.notna(df), None)
-        return df.to_dict('records')
+    # 출시 연월 일괄 계산 (_release_year()/_release_month()가 재사용)
+    ts = np.array([g.get("releaseDate") or g.get("firstReleaseDate") or 0 for g in games], dtype=np.int64)
+    years, months = _ms_to_year_month(ts)
 
-    # 폴백: JSON 개별 파일 로드 (로컬 개발용)
-    pattern = os.path.join(GAMES_DIR, "*.json")
-    games = []
-    for path in glob.glob(pattern):
-        if "_progress" in os.path.basename(path):
-            continue
+    for i, (g, yr, mo) in enumerate(zip(games, years.tolist(), months.tolist())):
+        g["_idx"] = i  # 전체 목록 내 위치 → _game_columns() 배열 인덱스
+        g["_release_year"] = yr if ts[i] else None
+        g["_release_month"] = f"{yr}-{mo:02d}" if ts[i] else None
+    return games
+
+
+# _game_columns()에 보관하는 게임 수치 필드 → dtype (None → 0)
+_NUMERIC_FIELDS = {
+    "copiesSold": np.int64,
+    "revenue": np.float64,
+    "reviews": np.int64,
+    "reviewScore": np.int64,
+    "avgPlaytime": np.float64,
+    "followers": np.float64,
+    "wishlists": np.float64,
+    "owners": np.int64,
+    "steamPercent": np.float64,
+    "price": np.float64,
+    "players": np.int64,
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _game_columns() -> dict[str, np.ndarray]:
+    """
+    전체 게임의 수치 컬럼 (NumPy 배열, game["_idx"] 순서).
+    필터·요약 통계를 게임별 루프 대신 배열 연산으로 계산하기 위해 1회 생성.
+    """
+    games = load_all_games()
+    cols = {
+        field: np.array([g.get(field) or 0 for g in games], dtype=dtype)
+        for field, dtype in _NUMERIC_FIELDS.items()
+    }
+    cols["release_year"] = np.array([_release_year(g) or 0 for g in games], dtype=np.int32)
+    return cols
+
+
+@st.cache_resource(show_spinner=False)
+def _label_index() -> dict[str, dict[str, np.ndarray]]:
+    """태그·장르 역색인: {"tags"|"genres": {라벨: game["_idx"] 배열}}."""
+    index: dict[str, dict] = {"tags": defaultdict(list), "genres": defaultdict(list)}
+    for g in load_all_games():
+        for field, labels in index.items():
+            for label in (g.get(field) or []):
+                labels[label].append(g["_idx"])
+    return {
+        field: {label: np.array(ids, dtype=np.int64) for label, ids in labels.items()}
+        for field, labels in index.items()
+    }
+
+
+def _positions(games: list[dict]) -> np.ndarray:
+    """게임 목록 → _game_columns() 배열 인덱스."""
+    return np.fromiter((g["_idx"] for g in games), dtype=np.int64, count=len(games))
+
+
+def get_numeric_columns(games: list[dict], fields: list[str]) -> dict[str, np.ndarray]:
+    """
+    게임 목록의 수치 필드 배열 (games 순서, 차트용 컬럼 데이터).
+    fields: _NUMERIC_FIELDS 키 또는 "release_year" (None → 0)
+    """
+    cols = _game_columns()
+    idx = _positions(games)
+    return {field: cols[field][idx] for field in fields}
+
+
+def get_histogram(
+    values: np.ndarray,
+    bins: int,
+    value_range: tuple[float, float] | None = None,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """
+    수치 배열의 구간별 개수 (히스토그램을 막대로 그릴 때 원시 값 대신 전송).
+    반환: (구간 중앙값, 구간별 개수, 구간 폭)
+    """
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return (edges[:-1] + edges[1:]) / 2, counts, float(edges[1] - edges[0])
+
+
+def _games_cache_key(games: list) -> bytes | str:
+    """집계 캐시 키: 게임 목록 → _idx 배열 바이트 (게임 dict 전체 해싱 생략)."""
+    if all(isinstance(g, dict) and "_idx" in g for g in games):
+        return _positions(games).tobytes()
+    return json.dumps(games, sort_keys=True, default=str)
+
+
+# 순수 집계 함수 캐시 (동일 필터 결과에 대한 재실행 시 재계산 생략)
+_cache_aggregate = st.cache_data(max_entries=32, show_spinner=False, hash_funcs={list: _games_cache_key})
+
+
+def _release_year(game: dict) -> int | None:
+    """게임 출시 연도 반환 (로드 시 계산값 우선, 없으면 ms 타임스탬프 → 연도)."""
+    if "_release_year" in game:
+        return game["_release_year"]
+    ts = game.get("releaseDate") or game.get("firstReleaseDate")
+    if ts:
         try:
-            with open(path, encoding="utf-8") as f:
-                data = json.load(f)
-            games.append(data)
+            return datetime.fromtimestamp(int(ts) / 1000, tz=timezone.utc).year
         except Exception:
             pass
-    return games
+    return None
 
 
-def _release_year(game: dict) -> int | None:
-    """게임 출시 연도 반환 (ms 타임스탬프 → 연도)."""
+def _release_month(game: dict) -> str | None:
+    """게임 출시 연월 'YYYY-MM' 반환 (로드 시 계산값 우선)."""
+    if "_release_month" in game:
+        return game["_release_month"]
     ts = game.get("releaseDate") or game.get("firstReleaseDate")
     if ts:
         try:
-            return datetime.fromtimestamp(int(ts) / 1000).year
+            return datetime.fromtimestamp(int(ts) / 1000, tz=timezone.utc).strftime("%Y-%m")
         except Exception:
             pass
     return None
@@ -97,35 +225,68 @@ def filter_games(
     year_min: int | None = None,
     year_max: int | None = None,
     sold_min: int | None = None,
+    sold_max: int | None = None,
     reviews_min: int | None = None,
 ) -> list[dict]:
     """조건 조합 필터링."""
-    result = []
-    for g in games:
-        if tags:
-            game_tags = g.get("tags") or []
-            if not any(t in game_tags for t in tags):
-                continue
-        if genres:
-            game_genres = g.get("genres") or []
-            if not any(gr in game_genres for gr in genres):
-                continue
-        if year_min or year_max:
-            yr = _release_year(g)
-            if yr is None:
-                continue
-            if year_min and yr < year_min:
-                continue
-            if year_max and yr > year_max:
-                continue
-        if sold_min is not None:
-            if (g.get("copiesSold") or 0) < sold_min:
-                continue
-        if reviews_min is not None:
-            if (g.get("reviews") or 0) < reviews_min:
-                continue
-        result.append(g)
-    return result
+    keep = _filter_positions(games, tags, genres, year_min, year_max, sold_min, sold_max, reviews_min)
+    return [games[i] for i in keep.tolist()]
+
+
+@_cache_aggregate
+def _filter_positions(
+    games: list[dict],
+    tags: list[str] | None,
+    genres: list[str] | None,
+    year_min: int | None,
+    year_max: int | None,
+    sold_min: int | None,
+    sold_max: int | None,
+    reviews_min: int | None,
+) -> np.ndarray:
+    """
+    filter_games 본체: 조건을 만족하는 games 내 위치 배열.
+    위치 배열만 캐시 (게임 dict 목록을 캐시하면 적중 시마다 전체 복사본이 역직렬화됨).
+    """
+    cols = _game_columns()
+    idx = _positions(games)
+    mask = np.ones(len(idx), dtype=bool)
+
+    if year_min or year_max:
+        yr = cols["release_year"][idx]
+        mask &= yr > 0
+        if year_min:
+            mask &= yr >= year_min
+        if year_max:
+            mask &= yr <= year_max
+    if sold_min is not None:
+        mask &= cols["copiesSold"][idx] >= sold_min
+    if sold_max is not None:
+        mask &= cols["copiesSold"][idx] <= sold_max
+    if reviews_min is not None:
+        mask &= cols["reviews"][idx] >= reviews_min
+
+    # 태그/장르: 역색인으로 해당 게임 집합을 만든 뒤 마스크 결합 (하나라도 포함)
+    index = _label_index()
+    for field, wanted in (("tags", tags), ("genres", genres)):
+        if wanted:
+            member = np.zeros(len(cols["release_year"]), dtype=bool)
+            for label in wanted:
+                member[index[field].get(label, [])] = True
+            mask &= member[idx]
+
+    return np.flatnonzero(mask)
+
+
+def _ms_to_year_month(ts_ms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ms 타임스탬프 배열 → (연도, 월) 배열 (datetime64 벡터 변환, UTC 기준)."""
+    months = ts_ms.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+    return months // 12 + 1970, months % 12 + 1
+
+
+def _increments(cumulative: np.ndarray) -> np.ndarray:
+    """누적 시계열 → 기간별 증분 (첫 기간은 0 기준, 감소분은 0)."""
+    return np.maximum(np.diff(cumulative, prepend=0), 0)
 
 
 def _get_yearly_increments(history: list[dict]) -> dict[int, dict]:
@@ -133,135 +294,287 @@ def _get_yearly_increments(history: list[dict]) -> dict[int, dict]:
     누적 history에서 연도별 증분 (sales, revenue) 계산.
     각 연도의 마지막 값 - 전년도 마지막 값.
     """
-    # 연도별 마지막 항목 수집
-    by_year: dict[int, dict] = {}
-    for item in history:
-        ts = item.get("timeStamp")
-        if not ts:
-            continue
-        try:
-            yr = datetime.fromtimestamp(int(ts) / 1000).year
-        except Exception:
-            continue
-        by_year[yr] = item  # 같은 연도에서 덮어쓰기 → 마지막 값
-
-    # 정렬된 연도 목록
-    years = sorted(by_year.keys())
-    increments: dict[int, dict] = {}
-    prev_sales = 0
-    prev_revenue = 0
-    for yr in years:
-        item = by_year[yr]
-        cur_sales = item.get("sales") or 0
-        cur_revenue = item.get("revenue") or 0
-        increments[yr] = {
-            "sales": max(0, cur_sales - prev_sales),
-            "revenue": max(0, cur_revenue - prev_revenue),
+    # 연도별 마지막 항목 수집 (타임스탬프 일괄 변환)
+    ts = np.array([item.get("timeStamp") or 0 for item in history], dtype=np.int64)
+    valid = np.flatnonzero(ts)
+    years, _ = _ms_to_year_month(ts[valid])
+    # 역순 첫 등장 위치 = 같은 연도의 마지막 항목 (연도 오름차순)
+    uniq_years, rev_first = np.unique(years[::-1], return_index=True)
+    last_items = [history[i] for i in valid[len(valid) - 1 - rev_first].tolist()]
+
+    cum_sales = np.array([item.get("sales") or 0 for item in last_items], dtype=np.int64)
+    cum_revenue = np.array([item.get("revenue") or 0 for item in last_items], dtype=np.int64)
+    rows = zip(
+        uniq_years.tolist(), last_items,
+        _increments(cum_sales).tolist(), _increments(cum_revenue).tolist(),
+        cum_sales.tolist(), cum_revenue.tolist(),
+    )
+    return {
+        yr: {
+            "sales": sales,
+            "revenue": revenue,
             "cumulative_sales": cur_sales,
             "cumulative_revenue": cur_revenue,
             "score": item.get("score") or 0,
         }
-        prev_sales = cur_sales
-        prev_revenue = cur_revenue
-    return increments
+        for yr, item, sales, revenue, cur_sales, cur_revenue in rows
+    }
+
+
+# 기간별 history 캐시에 보관하는 지표 → dtype (None → 0)
+_PERIOD_FIELDS = {
+    "sales": np.int64,
+    "revenue": np.int64,
+    "players": np.float64,
+    "score": np.float64,
+    "avgPlaytime": np.float64,
+    "price": np.float64,
+    "followers": np.int64,
+    "wishlists": np.int64,
+    "reviews": np.int64,
+}
+
+
+def _history_by_period(history: list[dict], freq: str) -> dict:
+    """
+    history → 기간별 마지막 항목 (기간 오름차순).
+    반환: {"period": [period], "key": 정렬용 정수 키(연도 또는 YYYYMM), "year": 연도 배열,
+           <_PERIOD_FIELDS 지표>: 배열}
+    """
+    ts = np.array([item.get("timeStamp") or 0 for item in history], dtype=np.int64)
+    order = np.argsort(ts, kind="stable")
+    order = order[ts[order] > 0]
+    years, months = _ms_to_year_month(ts[order])
+    yearly = freq == "yearly"
+    key = years if yearly else years * 100 + months
+    # 시간순 정렬 상태 → 다음 항목과 기간이 달라지는 위치가 기간별 마지막 항목
+    last = np.flatnonzero(np.append(key[1:] != key[:-1], True)) if len(key) else key
+
+    years, months = years[last], months[last]
+    items = [history[i] for i in order[last].tolist()]
+    if yearly:
+        periods = years.tolist()
+    else:
+        periods = [f"{yr}-{mo:02d}" for yr, mo in zip(years.tolist(), months.tolist())]
+
+    result = {"period": periods, "key": key[last], "year": years}
+    for field, dtype in _PERIOD_FIELDS.items():
+        result[field] = np.array([item.get(field) or 0 for item in items], dtype=dtype)
+    return result
+
+
+@st.cache_resource(show_spinner=False)
+def _yearly_increment_table() -> dict[str, np.ndarray]:
+    """
+    전체 게임의 연도별 증분을 (연도, 게임) 순으로 펼친 long-format 배열 (최초 1회 계산).
+    반환: {"game": game["_idx"], "year", "sales", "revenue", "score"}
+    """
+    parts = defaultdict(list)
+    for g in load_all_games():
+        for yr, data in _get_yearly_increments(_parse_field(g.get("history"), default=[])).items():
+            parts["game"].append(g["_idx"])
+            parts["year"].append(yr)
+            parts["sales"].append(data["sales"])
+            parts["revenue"].append(data["revenue"])
+            parts["score"].append(data["score"])
+
+    table = {
+        "game": np.array(parts["game"], dtype=np.int64),
+        "year": np.array(parts["year"], dtype=np.int64),
+        "sales": np.array(parts["sales"], dtype=np.int64),
+        "revenue": np.array(parts["revenue"], dtype=np.int64),
+        "score": np.array(parts["score"], dtype=np.float64),
+    }
+    order = np.lexsort((table["game"], table["year"]))
+    return {key: arr[order] for key, arr in table.items()}
+
+
+@st.cache_resource(show_spinner=False)
+def _all_period_history(freq: str) -> list[dict]:
+    """전체 게임의 기간별 마지막 history 항목 (game["_idx"] 순서, freq별 1회 계산)."""
+    return [
+        _history_by_period(_parse_field(g.get("history"), default=[]), freq)
+        for g in load_all_games()
+    ]
 
 
+@_cache_aggregate
 def get_yearly_trends(games: list[dict]) -> dict[int, dict]:
     """
     전체 게임 목록의 연도별 집계.
     반환: {year: {revenue, sales, game_count, avg_score}}
     """
-    totals: dict[int, dict] = defaultdict(lambda: {"revenue": 0, "sales": 0, "game_count": 0, "score_sum": 0, "score_count": 0})
-
-    for game in games:
-        history = _parse_field(game.get("history"), default=[])
-        increments = _get_yearly_increments(history)
-        for yr, data in increments.items():
-            totals[yr]["revenue"] += data["revenue"]
-            totals[yr]["sales"] += data["sales"]
-            if data["sales"] > 0:
-                totals[yr]["game_count"] += 1
-            if data["score"] > 0:
-                totals[yr]["score_sum"] += data["score"]
-                totals[yr]["score_count"] += 1
-
-    result = {}
-    for yr, data in sorted(totals.items()):
-        result[yr] = {
-            "revenue": data["revenue"],
-            "sales": data["sales"],
-            "game_count": data["game_count"],
-            "avg_score": (data["score_sum"] / data["score_count"]) if data["score_count"] > 0 else 0,
-        }
-    return result
+    table = _yearly_increment_table()
+    member = np.zeros(len(_game_columns()["release_year"]), dtype=bool)
+    member[_positions(games)] = True
+    rows = member[table["game"]]
+    if not rows.any():
+        return {}
+
+    # 연도 정렬 상태 → 연도 경계별 구간 합 (reduceat, 정수 합은 int64 그대로)
+    years = table["year"][rows]
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    sales = table["sales"][rows]
+    score = table["score"][rows]
+    scored = score > 0
+    revenue_sum = np.add.reduceat(table["revenue"][rows], starts)
+    sales_sum = np.add.reduceat(sales, starts)
+    game_count = np.add.reduceat((sales > 0).astype(np.int64), starts)
+    score_sum = np.add.reduceat(np.where(scored, score, 0), starts)
+    score_count = np.add.reduceat(scored.astype(np.int64), starts)
+    avg_score = np.divide(score_sum, score_count, out=np.zeros_like(score_sum), where=score_count > 0)
+
+    cols = zip(years[starts].tolist(), revenue_sum.tolist(), sales_sum.tolist(),
+               game_count.tolist(), avg_score.tolist())
+    return {
+        yr: {"revenue": revenue, "sales": sales, "game_count": count, "avg_score": avg}
+        for yr, revenue, sales, count, avg in cols
+    }
+
+
+@_cache_aggregate
+def get_overview_stats(games: list[dict]) -> dict:
+    """
+    게임 목록 주요 지표 (랜딩 페이지 카드용).
+    반환: {total_games, total_revenue, total_sales, hit_count, year_min, year_max}
+    """
+    cols = _game_columns()
+    idx = _positions(games)
+    sales = cols["copiesSold"][idx]
+    years = cols["release_year"][idx]
+    years = years[years > 0]
+    return {
+        "total_games": len(games),
+        "total_revenue": cols["revenue"][idx].sum().item(),
+        "total_sales": sales.sum().item(),
+        "hit_count": int(np.count_nonzero(sales >= 1_000_000)),
+        "year_min": years.min().item() if len(years) else 0,
+        "year_max": years.max().item() if len(years) else 0,
+    }
+
+
+@_cache_aggregate
+def get_kpi_summary(games: list[dict]) -> dict:
+    """
+    게임 목록 KPI 카드 지표 (페이지 상단 요약용).
+    평균 점수·플레이타임·팔로워·위시리스트는 값이 있는 게임만 평균, 없으면 None.
+    반환: {game_count, total_revenue, avg_revenue, avg_sales, hit_count,
+           avg_score, avg_playtime, avg_followers, avg_wishlists}
+    """
+    cols = _game_columns()
+    idx = _positions(games)
+    revenue = cols["revenue"][idx]
+    sales = cols["copiesSold"][idx]
+
+    def nonzero_mean(field):
+        vals = cols[field][idx]
+        vals = vals[vals != 0]
+        return vals.mean().item() if len(vals) else None
+
+    return {
+        "game_count": len(games),
+        "total_revenue": revenue.sum().item(),
+        "avg_revenue": revenue.mean().item() if len(idx) else None,
+        "avg_sales": sales.mean().item() if len(idx) else None,
+        "hit_count": int(np.count_nonzero(sales >= 1_000_000)),
+        "avg_score": nonzero_mean("reviewScore"),
+        "avg_playtime": nonzero_mean("avgPlaytime"),
+        "avg_followers": nonzero_mean("followers"),
+        "avg_wishlists": nonzero_mean("wishlists"),
+    }
 
 
 def get_top_games(games: list[dict], n: int = 20, sort_by: str = "revenue") -> list[dict]:
     """상위 N개 게임 반환."""
+    if sort_by in _NUMERIC_FIELDS and all("_idx" in g for g in games):
+        return [games[i] for i in _top_positions(games, n, sort_by).tolist()]
+
     def sort_key(g):
         return g.get(sort_by) or 0
 
-    return sorted(games, key=sort_key, reverse=True)[:n]
+    return heapq.nlargest(n, games, key=sort_key)
 
 
-def get_genre_stats(games: list[dict]) -> dict[str, dict]:
-    """장르별 통계 (평균 수익·판매량·리뷰 점수·게임 수)."""
-    stats: dict[str, dict] = defaultdict(lambda: {
-        "revenue_sum": 0, "sales_sum": 0, "score_sum": 0,
-        "count": 0, "score_count": 0
-    })
+@_cache_aggregate
+def _top_positions(games: list[dict], n: int, sort_by: str) -> np.ndarray:
+    """get_top_games 본체: 수치 컬럼 내림차순 상위 n개 위치 (동점은 원래 순서 유지)."""
+    values = _game_columns()[sort_by][_positions(games)]
+    return np.argsort(-values, kind="stable")[:n]
+
 
+@st.cache_resource(show_spinner=False)
+def _label_matrix(field: str) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    전체 게임의 태그·장르 멤버십 행렬 (game["_idx"] 순서).
+    반환: (라벨 목록, 등장 횟수 행렬 [게임 × 라벨], 게임 내 첫 위치 행렬)
+    """
+    games = load_all_games()
+    labels: dict[str, int] = {}
     for g in games:
-        for genre in (g.get("genres") or []):
-            stats[genre]["revenue_sum"] += g.get("revenue") or 0
-            stats[genre]["sales_sum"] += g.get("copiesSold") or 0
-            stats[genre]["count"] += 1
-            score = g.get("reviewScore") or 0
-            if score > 0:
-                stats[genre]["score_sum"] += score
-                stats[genre]["score_count"] += 1
-
-    result = {}
-    for genre, data in sorted(stats.items(), key=lambda x: x[1]["revenue_sum"], reverse=True):
-        count = data["count"]
-        result[genre] = {
-            "game_count": count,
-            "avg_revenue": data["revenue_sum"] / count if count else 0,
-            "avg_sales": data["sales_sum"] / count if count else 0,
-            "avg_score": data["score_sum"] / data["score_count"] if data["score_count"] else 0,
-            "total_revenue": data["revenue_sum"],
+        for label in (g.get(field) or []):
+            labels.setdefault(label, len(labels))
+
+    counts = np.zeros((len(games), len(labels)), dtype=np.int16)
+    first_pos = np.full((len(games), len(labels)), np.iinfo(np.int16).max, dtype=np.int16)
+    for i, g in enumerate(games):
+        for pos, label in enumerate(g.get(field) or []):
+            j = labels[label]
+            counts[i, j] += 1
+            first_pos[i, j] = min(first_pos[i, j], pos)
+    return list(labels), counts, first_pos
+
+
+def _label_stats(games: list[dict], field: str, sort_by: str) -> dict[str, dict]:
+    """태그·장르별 통계 (멤버십 행렬 × 수치 컬럼 행렬곱). sort_by: 'revenue' | 'count'."""
+    labels, counts, first_pos = _label_matrix(field)
+    cols = _game_columns()
+    idx = _positions(games)
+    if not len(idx):
+        return {}
+
+    mat = counts[idx]
+    count = mat.sum(axis=0)
+    present = np.flatnonzero(count)
+    mat, count = mat[:, present], count[present]
+
+    scores = cols["reviewScore"][idx]
+    revenue_sum = cols["revenue"][idx] @ mat
+    sales_sum = cols["copiesSold"][idx] @ mat
+    score_sum = np.where(scores > 0, scores, 0) @ mat
+    score_count = (scores > 0).astype(np.int64) @ mat
+
+    # 내림차순 정렬, 동률은 목록 내 첫 등장 순 (게임 순서 → 게임 내 위치)
+    first_row = (mat > 0).argmax(axis=0)
+    first_in_row = first_pos[idx[first_row], present]
+    key = revenue_sum if sort_by == "revenue" else count
+    order = np.lexsort((first_in_row, first_row, -key))
+
+    rows = zip(
+        count[order].tolist(), revenue_sum[order].tolist(), sales_sum[order].tolist(),
+        score_sum[order].tolist(), score_count[order].tolist(),
+    )
+    return {
+        labels[present[j]]: {
+            "game_count": n,
+            "avg_revenue": rev / n,
+            "avg_sales": sales / n,
+            "avg_score": sc_sum / sc_count if sc_count else 0,
+            "total_revenue": rev,
         }
-    return result
+        for j, (n, rev, sales, sc_sum, sc_count) in zip(order.tolist(), rows)
+    }
 
 
+@_cache_aggregate
+def get_genre_stats(games: list[dict]) -> dict[str, dict]:
+    """장르별 통계 (평균 수익·판매량·리뷰 점수·게임 수)."""
+    return _label_stats(games, "genres", sort_by="revenue")
+
+
+@_cache_aggregate
 def get_tag_stats(games: list[dict]) -> dict[str, dict]:
     """태그별 통계."""
-    stats: dict[str, dict] = defaultdict(lambda: {
-        "revenue_sum": 0, "sales_sum": 0, "score_sum": 0,
-        "count": 0, "score_count": 0
-    })
-
-    for g in games:
-        for tag in (g.get("tags") or []):
-            stats[tag]["revenue_sum"] += g.get("revenue") or 0
-            stats[tag]["sales_sum"] += g.get("copiesSold") or 0
-            stats[tag]["count"] += 1
-            score = g.get("reviewScore") or 0
-            if score > 0:
-                stats[tag]["score_sum"] += score
-                stats[tag]["score_count"] += 1
-
-    result = {}
-    for tag, data in sorted(stats.items(), key=lambda x: x[1]["count"], reverse=True):
-        count = data["count"]
-        result[tag] = {
-            "game_count": count,
-            "avg_revenue": data["revenue_sum"] / count if count else 0,
-            "avg_sales": data["sales_sum"] / count if count else 0,
-            "avg_score": data["score_sum"] / data["score_count"] if data["score_count"] else 0,
-            "total_revenue": data["revenue_sum"],
-        }
-    return result
+    return _label_stats(games, "tags", sort_by="count")
 
 
 def get_audience_overlap_network(games: list[dict]) -> list[dict]:
@@ -278,7 +591,7 @@ def get_audience_overlap_network(games: list[dict]) -> list[dict]:
             link = overlap.get("link", 0)
             if link < 0.1:
                 continue
-            key = tuple(sorted([src_id, tgt_id]))
+            key = (src_id, tgt_id) if src_id < tgt_id else (tgt_id, src_id)
             if key in seen:
                 continue
             seen.add(key)
@@ -293,59 +606,94 @@ def get_audience_overlap_network(games: list[dict]) -> list[dict]:
     return edges
 
 
+@_cache_aggregate
 def get_common_tags(games: list[dict], top_n: int = 15) -> list[tuple[str, int]]:
-    """성공 게임들의 공통 태그 Top N."""
-    from collections import Counter
-    counter: Counter = Counter()
-    for g in games:
-        for tag in (g.get("tags") or []):
-            counter[tag] += 1
-    return counter.most_common(top_n)
+    """성공 게임들의 공통 태그 Top N (태그 멤버십 행렬 열 합계)."""
+    labels, counts, first_pos = _label_matrix("tags")
+    idx = _positions(games)
+    if not len(idx):
+        return []
+
+    mat = counts[idx]
+    count = mat.sum(axis=0, dtype=np.int64)
+    present = np.flatnonzero(count)
+    mat, count = mat[:, present], count[present]
+
+    # Counter.most_common과 같은 순서: 내림차순, 동률은 첫 등장 순 (게임 순서 → 게임 내 위치)
+    first_row = (mat > 0).argmax(axis=0)
+    first_in_row = first_pos[idx[first_row], present]
+    order = np.lexsort((first_in_row, first_row, -count))[:top_n]
+    return [(labels[present[j]], n) for j, n in zip(order.tolist(), count[order].tolist())]
 
 
+# 가격대 구간 (무료, 경계값 기준 미만 구간, $60+)
+_PRICE_EDGES = np.array([5, 10, 20, 30, 60])
+_PRICE_LABELS = ("무료", "$0~5", "$5~10", "$10~20", "$20~30", "$30~60", "$60+")
+
+
+@_cache_aggregate
 def get_price_buckets(games: list[dict]) -> list[dict]:
     """가격대별 게임 목록 (박스플롯용)."""
-    buckets = []
-    for g in games:
-        price = g.get("price") or 0
-        if price == 0:
-            label = "무료"
-        elif price < 5:
-            label = "$0~5"
-        elif price < 10:
-            label = "$5~10"
-        elif price < 20:
-            label = "$10~20"
-        elif price < 30:
-            label = "$20~30"
-        elif price < 60:
-            label = "$30~60"
-        else:
-            label = "$60+"
-        buckets.append({
+    cols = _game_columns()
+    idx = _positions(games)
+    prices = cols["price"][idx]
+
+    # 구간 경계 이상이면 다음 구간 (0은 무료 별도)
+    bucket = np.searchsorted(_PRICE_EDGES, prices, side="right") + 1
+    bucket[prices == 0] = 0
+    labels = np.array(_PRICE_LABELS)[bucket]
+
+    rows = zip(
+        games, prices.tolist(), labels.tolist(),
+        cols["revenue"][idx].tolist(), cols["copiesSold"][idx].tolist(), cols["reviewScore"][idx].tolist(),
+    )
+    return [
+        {
             "name": g.get("name"),
             "price": price,
             "price_bucket": label,
-            "revenue": g.get("revenue") or 0,
-            "copiesSold": g.get("copiesSold") or 0,
-            "reviewScore": g.get("reviewScore") or 0,
-        })
-    return buckets
+            "revenue": revenue,
+            "copiesSold": sold,
+            "reviewScore": score,
+        }
+        for g, price, label, revenue, sold, score in rows
+    ]
 
 
+@_cache_aggregate
 def get_monthly_releases(games: list[dict]) -> list[dict]:
     """월별 신규 출시 게임 수 집계."""
-    monthly: dict[str, int] = defaultdict(int)
-    for g in games:
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        if ts:
-            try:
-                dt = datetime.fromtimestamp(int(ts) / 1000)
-                key = dt.strftime("%Y-%m")
-                monthly[key] += 1
-            except Exception:
-                pass
-    return [{"month": k, "count": v} for k, v in sorted(monthly.items())]
+    ts = np.array(
+        [g.get("releaseDate") or g.get("firstReleaseDate") or 0 for g in games],
+        dtype=np.int64,
+    )
+    years, months = _ms_to_year_month(ts[ts > 0])
+    keys, counts = np.unique(years * 100 + months, return_counts=True)
+    return [
+        {"month": f"{k // 100}-{k % 100:02d}", "count": c}
+        for k, c in zip(keys.tolist(), counts.tolist())
+    ]
+
+
+def _top_game_line(
+    rank: int,
+    g: dict,
+    score_label: str,
+    with_tags: bool = False,
+    with_playtime: bool = False,
+) -> str:
+    """요약용 상위 게임 한 줄 (출시 연도는 로드 시 계산값 사용)."""
+    parts = [
+        f"{rank}. {g.get('name', '?')} ({_release_year(g) or '?'})",
+        f"수익 ${(g.get('revenue') or 0):,.0f}",
+        f"판매 {(g.get('copiesSold') or 0):,}장",
+        score_label.format(g.get("reviewScore", 0)),
+    ]
+    if with_tags:
+        parts.append(f"태그: {', '.join((g.get('tags') or [])[:5])}")
+    if with_playtime:
+        parts.append(f"플레이타임 {(g.get('avgPlaytime') or 0):.0f}h")
+    return " | ".join(parts)
 
 
 def summarize_for_claude(games: list[dict], max_games: int = 30) -> str:
@@ -353,19 +701,23 @@ def summarize_for_claude(games: list[dict], max_games: int = 30) -> str:
     if not games:
         return "데이터 없음"
 
-    total = len(games)
-    revenues = [g.get("revenue") or 0 for g in games]
-    sales = [g.get("copiesSold") or 0 for g in games]
-    scores = [g.get("reviewScore") or 0 for g in games if g.get("reviewScore")]
+    cols = _game_columns()
+    idx = _positions(games)
+    revenues = cols["revenue"][idx]
+    sales = cols["copiesSold"][idx]
+    scores = cols["reviewScore"][idx]
+    scores = scores[scores != 0]
 
-    avg_revenue = sum(revenues) / total if total else 0
-    avg_sales = sum(sales) / total if total else 0
-    avg_score = sum(scores) / len(scores) if scores else 0
-    total_revenue = sum(revenues)
-    total_sales = sum(sales)
+    total = len(games)
+    total_revenue = float(revenues.sum())
+    total_sales = int(sales.sum())
+    avg_revenue = total_revenue / total
+    avg_sales = total_sales / total
+    avg_score = float(scores.mean()) if len(scores) else 0
+    hit_count = int((sales >= 1_000_000).sum())
 
     # 상위 N개 게임
-    top_games = sorted(games, key=lambda x: x.get("revenue") or 0, reverse=True)[:max_games]
+    top_games = heapq.nlargest(max_games, games, key=lambda x: x.get("revenue") or 0)
 
     lines = [
         f"## 전체 통계 (총 {total}개 게임)",
@@ -374,45 +726,37 @@ def summarize_for_claude(games: list[dict], max_games: int = 30) -> str:
         f"- 평균 수익: ${avg_revenue:,.0f}",
         f"- 평균 판매량: {avg_sales:,.0f}장",
         f"- 평균 리뷰 점수: {avg_score:.1f}/100",
-        f"- 히트작 (100만장+): {sum(1 for s in sales if s >= 1_000_000)}개",
+        f"- 히트작 (100만장+): {hit_count}개",
         "",
         f"## 상위 {len(top_games)}개 게임",
     ]
-    for i, g in enumerate(top_games, 1):
-        yr = _release_year(g)
-        lines.append(
-            f"{i}. {g.get('name', '?')} ({yr}) | "
-            f"수익 ${(g.get('revenue') or 0):,.0f} | "
-            f"판매 {(g.get('copiesSold') or 0):,}장 | "
-            f"리뷰 {g.get('reviewScore', 0)}/100 | "
-            f"태그: {', '.join((g.get('tags') or [])[:5])}"
-        )
+    lines.extend(
+        _top_game_line(i, g, score_label="리뷰 {}/100", with_tags=True)
+        for i, g in enumerate(top_games, 1)
+    )
 
     return "\n".join(lines)
 
 
+@_cache_aggregate
 def get_all_tags(games: list[dict], min_count: int = 3) -> list[str]:
     """전체 태그 목록 (등장 횟수 기준 필터)."""
     from collections import Counter
-    counter: Counter = Counter()
-    for g in games:
-        for tag in (g.get("tags") or []):
-            counter[tag] += 1
+    counter = Counter(chain.from_iterable(g.get("tags") or () for g in games))
     return [tag for tag, cnt in counter.most_common() if cnt >= min_count]
 
 
+@_cache_aggregate
 def get_all_genres(games: list[dict]) -> list[str]:
     """전체 장르 목록."""
     from collections import Counter
-    counter: Counter = Counter()
-    for g in games:
-        for genre in (g.get("genres") or []):
-            counter[genre] += 1
+    counter = Counter(chain.from_iterable(g.get("genres") or () for g in games))
     return [genre for genre, _ in counter.most_common()]
 
 
 # ── 시계열 히스토리 집계 ──────────────────────────────────────────────────────
 
+@_cache_aggregate
 def get_history_aggregate(
     games: list[dict],
     freq: str = "yearly",
@@ -433,114 +777,237 @@ def get_history_aggregate(
         total_games,                   # 데이터 있는 게임 수
     }}
     """
-    # {period: {metric: [values]}}
-    period_buckets: dict = defaultdict(lambda: defaultdict(list))
+    periods, columns = _history_columns(games, freq, year_min, year_max)
+    rows = zip(*(arr.tolist() for arr in columns.values()))
+    return {period: dict(zip(columns, row)) for period, row in zip(periods, rows)}
+
+
+@_cache_aggregate
+def get_history_aggregate_df(
+    games: list[dict],
+    freq: str = "yearly",
+    year_min: int = 2015,
+    year_max: int = 2026,
+):
+    """get_history_aggregate와 같은 집계를 DataFrame으로 (period 열 + 지표 열, 데이터 없으면 빈 DataFrame)."""
+    import pandas as pd
+
+    periods, columns = _history_columns(games, freq, year_min, year_max)
+    return pd.DataFrame({"period": periods, **columns}) if periods else pd.DataFrame()
 
-    for game in games:
-        history = sorted(_parse_field(game.get("history"), default=[]), key=lambda x: x.get("timeStamp", 0))
-        if not history:
+
+def _history_columns(
+    games: list[dict],
+    freq: str,
+    year_min: int,
+    year_max: int,
+) -> tuple[list, dict[str, np.ndarray]]:
+    """history 집계 본체: (기간 목록, {지표: 기간별 배열})."""
+    # 게임별 (기간 키, 지표) 레코드를 이어 붙인 뒤 기간 키로 그룹 집계
+    parts: dict[str, list] = defaultdict(list)
+    all_periods = _all_period_history(freq)
+    for i in _positions(games):
+        h = all_periods[i]
+        # 범위 밖 기간 제외 후 증분 계산
+        sel = (h["year"] >= year_min) & (h["year"] <= year_max)
+        if not sel.any():
             continue
+        parts["key"].append(h["key"][sel])
+        parts["sales_inc"].append(_increments(h["sales"][sel]))
+        parts["revenue_inc"].append(_increments(h["revenue"][sel]))
+        parts["ccu"].append(h["players"][sel])
+        parts["score"].append(h["score"][sel])
+        parts["playtime"].append(h["avgPlaytime"][sel])
+        parts["price"].append(h["price"][sel])
+        parts["followers"].append(h["followers"][sel])
+        parts["wishlists"].append(h["wishlists"][sel])
+    if not parts:
+        return [], {}
+
+    keys = np.concatenate(parts.pop("key"))
+    order = np.argsort(keys, kind="stable")
+    uniq_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    cols = {metric: np.concatenate(arrs)[order] for metric, arrs in parts.items()}
+
+    def _sum(vals):
+        return np.add.reduceat(vals, starts)
+
+    def _avg(vals):
+        # 0 이하 값 제외 평균
+        pos = vals > 0
+        n = _sum(pos.astype(np.int64))
+        return np.divide(_sum(np.where(pos, vals, 0)), n, out=np.zeros(len(n)), where=n > 0)
+
+    ccu_pos = np.where(cols["ccu"] > 0, cols["ccu"], 0)
+    columns = {
+        "sales_inc": _sum(cols["sales_inc"]),
+        "revenue_inc": _sum(cols["revenue_inc"]),
+        "avg_ccu": _avg(cols["ccu"]),
+        "max_ccu": np.maximum.reduceat(ccu_pos, starts),
+        "total_ccu": _sum(ccu_pos),
+        "avg_score": _avg(cols["score"]),
+        "avg_playtime": _avg(cols["playtime"]),
+        "avg_price": _avg(cols["price"]),
+        "avg_followers": _avg(cols["followers"]),
+        "avg_wishlists": _avg(cols["wishlists"]),
+        "total_games": counts,
+    }
 
-        # 기간별 마지막 항목 수집
-        by_period: dict = {}
-        for item in history:
-            ts = item.get("timeStamp")
-            if not ts:
-                continue
-            try:
-                dt = datetime.fromtimestamp(int(ts) / 1000)
-            except Exception:
-                continue
-            if dt.year < year_min or dt.year > year_max:
-                continue
-            period = dt.year if freq == "yearly" else dt.strftime("%Y-%m")
-            by_period[period] = item
-
-        # 증분 계산
-        prev_sales = 0
-        prev_revenue = 0
-        for period in sorted(by_period.keys()):
-            item = by_period[period]
-            cur_sales = item.get("sales") or 0
-            cur_revenue = item.get("revenue") or 0
-
-            period_buckets[period]["sales_inc"].append(max(0, cur_sales - prev_sales))
-            period_buckets[period]["revenue_inc"].append(max(0, cur_revenue - prev_revenue))
-            period_buckets[period]["ccu"].append(item.get("players") or 0)
-            period_buckets[period]["score"].append(item.get("score") or 0)
-            period_buckets[period]["playtime"].append(item.get("avgPlaytime") or 0)
-            period_buckets[period]["price"].append(item.get("price") or 0)
-            period_buckets[period]["followers"].append(item.get("followers") or 0)
-            period_buckets[period]["wishlists"].append(item.get("wishlists") or 0)
-
-            prev_sales = cur_sales
-            prev_revenue = cur_revenue
-
-    def _avg(lst):
-        lst = [x for x in lst if x and x > 0]
-        return sum(lst) / len(lst) if lst else 0
-
-    result = {}
-    for period, buckets in sorted(period_buckets.items()):
-        ccu_list = [x for x in buckets["ccu"] if x > 0]
-        result[period] = {
-            "sales_inc": sum(buckets["sales_inc"]),
-            "revenue_inc": sum(buckets["revenue_inc"]),
-            "avg_ccu": _avg(buckets["ccu"]),
-            "max_ccu": max(ccu_list) if ccu_list else 0,
-            "total_ccu": sum(ccu_list),
-            "avg_score": _avg(buckets["score"]),
-            "avg_playtime": _avg(buckets["playtime"]),
-            "avg_price": _avg(buckets["price"]),
-            "avg_followers": _avg(buckets["followers"]),
-            "avg_wishlists": _avg(buckets["wishlists"]),
-            "total_games": len(buckets["sales_inc"]),
-        }
-    return result
+    if freq == "yearly":
+        periods = uniq_keys.tolist()
+    else:
+        periods = [f"{k // 100}-{k % 100:02d}" for k in uniq_keys.tolist()]
+    return periods, columns
 
 
 def get_history_for_game(game: dict, freq: str = "monthly") -> dict:
     """단일 게임의 history를 기간별로 정리."""
-    history = sorted(_parse_field(game.get("history"), default=[]), key=lambda x: x.get("timeStamp", 0))
-    by_period: dict = {}
-    for item in history:
-        ts = item.get("timeStamp")
-        if not ts:
-            continue
-        try:
-            dt = datetime.fromtimestamp(int(ts) / 1000)
-        except Exception:
-            continue
-        period = dt.year if freq == "yearly" else dt.strftime("%Y-%m")
-        by_period[period] = item
-
-    result = {}
-    prev_sales = 0
-    prev_revenue = 0
-    for period in sorted(by_period.keys()):
-        item = by_period[period]
-        cur_sales = item.get("sales") or 0
-        cur_revenue = item.get("revenue") or 0
-        result[period] = {
-            "sales_inc": max(0, cur_sales - prev_sales),
-            "revenue_inc": max(0, cur_revenue - prev_revenue),
-            "cumul_sales": cur_sales,
-            "cumul_revenue": cur_revenue,
-            "ccu": item.get("players") or 0,
-            "score": item.get("score") or 0,
-            "playtime": item.get("avgPlaytime") or 0,
-            "price": item.get("price") or 0,
-            "followers": item.get("followers") or 0,
-            "wishlists": item.get("wishlists") or 0,
-            "reviews": item.get("reviews") or 0,
-        }
-        prev_sales = cur_sales
-        prev_revenue = cur_revenue
-    return result
+    if "_idx" in game:
+        h = _all_period_history(freq)[game["_idx"]]
+    else:
+        h = _history_by_period(_parse_field(game.get("history"), default=[]), freq)
+
+    columns = {
+        "sales_inc": _increments(h["sales"]),
+        "revenue_inc": _increments(h["revenue"]),
+        "cumul_sales": h["sales"],
+        "cumul_revenue": h["revenue"],
+        "ccu": h["players"],
+        "score": h["score"],
+        "playtime": h["avgPlaytime"],
+        "price": h["price"],
+        "followers": h["followers"],
+        "wishlists": h["wishlists"],
+        "reviews": h["reviews"],
+    }
+    rows = zip(*(arr.tolist() for arr in columns.values()))
+    return {period: dict(zip(columns, row)) for period, row in zip(h["period"], rows)}
+
+
+def downsample_lttb(y, threshold: int) -> np.ndarray:
+    """
+    LTTB(Largest-Triangle-Three-Buckets) 다운샘플링 → 유지할 위치 배열.
+    x는 등간격(위치)으로 가정. 첫·마지막 점은 항상 유지, 길이가 threshold 이하이면 전체 반환.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        # 다음 버킷 평균점과 직전 선택점 사이 삼각형 면적이 최대인 점 선택
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (end + next_end - 1) / 2
+        avg_y = y[end:next_end].mean()
+        xs = np.arange(start, end)
+        area = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
 
 
 # ── 국가별 집계 ───────────────────────────────────────────────────────────────
 
+@st.cache_resource(show_spinner=False)
+def _country_matrix() -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    전체 게임의 countryData 행렬 (game["_idx"] 순서).
+    반환: (국가 코드 목록, 비율 행렬 [게임 × 국가], 코드 존재 여부 행렬)
+    """
+    games = load_all_games()
+    rows = []
+    codes: dict[str, int] = {}
+    for g in games:
+        cd = _parse_field(g.get("countryData"), default={})
+        if not isinstance(cd, dict):
+            cd = {}
+        rows.append(cd)
+        for code in cd:
+            codes.setdefault(code, len(codes))
+
+    pct_mat = np.zeros((len(games), len(codes)), dtype=np.float64)
+    present = np.zeros((len(games), len(codes)), dtype=bool)
+    for i, cd in enumerate(rows):
+        for code, pct in cd.items():
+            pct_mat[i, codes[code]] = pct
+            present[i, codes[code]] = True
+    return list(codes), pct_mat, present
+
+
+@st.cache_resource(show_spinner=False)
+def _top_country_codes() -> list[str | None]:
+    """게임별 비율 1위 국가 코드 (대문자, countryData 없으면 None). game["_idx"] 순서."""
+    top = []
+    for g in load_all_games():
+        cd = _parse_field(g.get("countryData"), default={})
+        top.append(max(cd.items(), key=itemgetter(1))[0].upper() if cd else None)
+    return top
+
+
+def get_top_country(games: list[dict]) -> list[str | None]:
+    """게임 목록의 1위 국가 코드 (games 순서, 게임별 countryData 파싱은 프로세스당 1회)."""
+    top = _top_country_codes()
+    return [top[g["_idx"]] for g in games]
+
+
+@st.cache_resource(show_spinner=False)
+def _playtime_matrix() -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    전체 게임의 playtimeData.distribution 행렬 (game["_idx"] 순서).
+    반환: (구간 목록, 비율 행렬 [게임 × 구간], 구간 존재 여부 행렬)
+    """
+    games = load_all_games()
+    rows = []
+    buckets: dict[str, int] = {}
+    for g in games:
+        pd_data = _parse_field(g.get("playtimeData"), default={})
+        dist = pd_data.get("distribution") if isinstance(pd_data, dict) else None
+        if not isinstance(dist, dict):
+            dist = {}
+        rows.append(dist)
+        for bucket in dist:
+            buckets.setdefault(bucket, len(buckets))
+
+    pct_mat = np.zeros((len(games), len(buckets)), dtype=np.float64)
+    present = np.zeros((len(games), len(buckets)), dtype=bool)
+    for i, dist in enumerate(rows):
+        for bucket, pct in dist.items():
+            pct_mat[i, buckets[bucket]] = pct
+            present[i, buckets[bucket]] = True
+    return list(buckets), pct_mat, present
+
+
+@_cache_aggregate
+def get_playtime_distribution(games: list[dict]) -> dict[str, float]:
+    """
+    플레이타임 구간별 평균 유저 비율 (distribution이 있는 게임 기준).
+    반환: {구간: 평균 비율(%)} — 등장한 구간만, 데이터 없으면 {}
+    """
+    buckets, pct_mat, present = _playtime_matrix()
+    idx = _positions(games)
+    idx = idx[present[idx].any(axis=1)]
+    if not len(idx):
+        return {}
+    seen = present[idx].any(axis=0)
+    avgs = pct_mat[idx].sum(axis=0) / len(idx)
+    return {buckets[j]: avgs[j].item() for j in np.flatnonzero(seen).tolist()}
+
+
+def _rank_seen_columns(seen: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    등장한 열만 값 내림차순 정렬한 열 번호 (동률은 행 순서상 첫 등장 순).
+    seen: [행 × 열] 등장 여부, values: 열별 값.
+    """
+    cols = np.flatnonzero(seen.any(axis=0))
+    return cols[np.lexsort((seen[:, cols].argmax(axis=0), -values[cols]))]
+
+
+@_cache_aggregate
 def get_country_aggregate(
     games: list[dict],
     weight_by: str = "revenue",
@@ -560,29 +1027,25 @@ def get_country_aggregate(
         "th": "태국", "id": "인도네시아", "sg": "싱가포르",
     }
 
-    weighted: dict[str, float] = defaultdict(float)
-    total_weight = 0.0
-
-    for g in games:
-        cd = _parse_field(g.get("countryData"), default={})
-        if not isinstance(cd, dict) or not cd:
-            continue
-        if weight_by == "revenue":
-            w = g.get("revenue") or 1
-        elif weight_by == "sales":
-            w = g.get("copiesSold") or 1
-        else:
-            w = 1.0
-        total_weight += w
-        for code, pct in cd.items():
-            weighted[code] += pct * w
+    codes, pct_mat, present = _country_matrix()
+    idx = _positions(games)
+    idx = idx[present[idx].any(axis=1)]  # countryData 없는 게임 제외
 
+    if weight_by in ("revenue", "sales"):
+        w = _game_columns()["revenue" if weight_by == "revenue" else "copiesSold"][idx].astype(np.float64)
+        w[w == 0] = 1
+    else:
+        w = np.ones(len(idx))
+    total_weight = w.sum()
     if total_weight == 0:
         return {}
 
+    weighted = w @ pct_mat[idx]
+    cols = _rank_seen_columns(present[idx], weighted)
+
     result = {
-        code: round(val / total_weight, 2)
-        for code, val in sorted(weighted.items(), key=lambda x: x[1], reverse=True)
+        codes[j]: round(val / total_weight, 2)
+        for j, val in zip(cols.tolist(), weighted[cols].tolist())
     }
     # 국가명 추가
     return {
@@ -593,38 +1056,89 @@ def get_country_aggregate(
 
 # ── 유저 활동 지표 요약 ───────────────────────────────────────────────────────
 
+@_cache_aggregate
 def get_activity_summary(games: list[dict]) -> dict:
     """유저 활동 지표 전체 요약."""
     if not games:
         return {}
 
-    def _stats(vals):
-        vals = [v for v in vals if v and v > 0]
-        if not vals:
+    cols = _game_columns()
+    idx = _positions(games)
+
+    def _stats(field):
+        vals = cols[field][idx]
+        vals = vals[vals > 0]
+        if not len(vals):
             return {"avg": 0, "max": 0, "median": 0, "total": 0}
-        vals_sorted = sorted(vals)
+        total = vals.sum()
         return {
-            "avg": sum(vals) / len(vals),
-            "max": max(vals),
-            "median": vals_sorted[len(vals_sorted) // 2],
-            "total": sum(vals),
+            "avg": total.item() / len(vals),
+            "max": vals.max().item(),
+            "median": np.partition(vals, len(vals) // 2)[len(vals) // 2].item(),
+            "total": total.item(),
             "count": len(vals),
         }
 
     return {
-        "reviews": _stats([g.get("reviews") or 0 for g in games]),
-        "review_score": _stats([g.get("reviewScore") or 0 for g in games]),
-        "avg_playtime": _stats([g.get("avgPlaytime") or 0 for g in games]),
-        "followers": _stats([g.get("followers") or 0 for g in games]),
-        "wishlists": _stats([g.get("wishlists") or 0 for g in games]),
-        "owners": _stats([g.get("owners") or 0 for g in games]),
-        "steam_percent": _stats([g.get("steamPercent") or 0 for g in games]),
-        "price": _stats([g.get("price") or 0 for g in games]),
-        "copies_sold": _stats([g.get("copiesSold") or 0 for g in games]),
-        "revenue": _stats([g.get("revenue") or 0 for g in games]),
+        "reviews": _stats("reviews"),
+        "review_score": _stats("reviewScore"),
+        "avg_playtime": _stats("avgPlaytime"),
+        "followers": _stats("followers"),
+        "wishlists": _stats("wishlists"),
+        "owners": _stats("owners"),
+        "steam_percent": _stats("steamPercent"),
+        "price": _stats("price"),
+        "copies_sold": _stats("copiesSold"),
+        "revenue": _stats("revenue"),
+    }
+
+
+# get_audience_overlap_top 집계 대상 최소 link
+_OVERLAP_MIN_LINK = 0.05
+
+
+@st.cache_resource(show_spinner=False)
+def _overlap_records() -> dict:
+    """
+    전체 게임의 audienceOverlap 평탄화 레코드 (link > _OVERLAP_MIN_LINK, game["_idx"] 순서).
+    게임 i의 레코드는 [start[i], end[i]) 구간, 외부 게임은 sids[sid_code]로 식별.
+    """
+    games = load_all_games()
+    sid_codes: dict = {}
+    cols: dict[str, list] = defaultdict(list)
+    start = np.zeros(len(games), dtype=np.int64)
+    end = np.zeros(len(games), dtype=np.int64)
+    for i, g in enumerate(games):
+        start[i] = len(cols["link"])
+        for ao in _parse_field(g.get("audienceOverlap"), default=[]):
+            link = ao.get("link") or 0
+            if link <= _OVERLAP_MIN_LINK:
+                continue
+            sid = ao.get("steamId")
+            cols["sid_code"].append(sid_codes.setdefault(sid, len(sid_codes)))
+            cols["link"].append(link)
+            cols["copiesSold"].append(ao.get("copiesSold") or 0)
+            cols["revenue"].append(ao.get("revenue") or 0)
+            cols["ccu"].append(ao.get("players") or 0)
+            cols["name"].append(ao.get("name", sid))
+            cols["genres"].append(ao.get("genres") or [])
+        end[i] = len(cols["link"])
+
+    return {
+        "start": start,
+        "end": end,
+        "sids": list(sid_codes),
+        "sid_code": np.array(cols["sid_code"], dtype=np.int64),
+        "link": np.array(cols["link"], dtype=np.float64),
+        "copiesSold": np.array(cols["copiesSold"], dtype=np.int64),
+        "revenue": np.array(cols["revenue"], dtype=np.float64),
+        "ccu": np.array(cols["ccu"], dtype=np.float64),
+        "name": cols["name"],
+        "genres": cols["genres"],
     }
 
 
+@_cache_aggregate
 def get_audience_overlap_top(
     games: list[dict],
     top_n: int = 30,
@@ -639,35 +1153,40 @@ def get_audience_overlap_top(
       'overlap_game_count'- 겹친 게임 수 (광범위성)
       'copies_sold'       - 외부 게임 판매량
     """
-    from collections import Counter
-    overlap_count: Counter = Counter()
-    overlap_data: dict = defaultdict(list)
-
-    for g in games:
-        for ao in _parse_field(g.get("audienceOverlap"), default=[]):
-            sid = ao.get("steamId")
-            link = ao.get("link") or 0
-            if link > 0.05:
-                overlap_count[sid] += 1
-                overlap_data[sid].append({
-                    "name": ao.get("name", sid),
-                    "link": link,
-                    "genres": ao.get("genres") or [],
-                    "copiesSold": ao.get("copiesSold") or 0,
-                    "revenue": ao.get("revenue") or 0,
-                    "ccu": ao.get("players") or 0,
-                })
+    rec = _overlap_records()
+    idx = _positions(games)
+
+    # 부분집합 게임 순서대로 레코드 행 번호 나열 (게임별 [start, end) 구간 연결)
+    starts, ends = rec["start"][idx], rec["end"][idx]
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    rows = offsets + np.arange(lengths.sum())
+
+    codes = rec["sid_code"][rows]
+    n_codes = len(rec["sids"])
+    counts = np.bincount(codes, minlength=n_codes)
+    link_sum = np.bincount(codes, weights=rec["link"][rows], minlength=n_codes)
+    copies_max = np.zeros(n_codes, dtype=np.int64)
+    revenue_max = np.zeros(n_codes)
+    ccu_max = np.zeros(n_codes)
+    np.maximum.at(copies_max, codes, rec["copiesSold"][rows])
+    np.maximum.at(revenue_max, codes, rec["revenue"][rows])
+    np.maximum.at(ccu_max, codes, rec["ccu"][rows])
+
+    # 겹친 횟수 내림차순, 동률은 첫 등장 순 → 상위 top_n*2개 후보
+    seen_codes, first = np.unique(codes, return_index=True)
+    cand = np.lexsort((first, -counts[seen_codes]))[: top_n * 2]
 
     total_games = len(games)
     result = []
-    for sid, cnt in overlap_count.most_common(top_n * 2):
-        items = overlap_data[sid]
-        avg_link = sum(x["link"] for x in items) / len(items)
+    for code, first_row in zip(seen_codes[cand].tolist(), rows[first[cand]].tolist()):
+        cnt = int(counts[code])
+        avg_link = float(link_sum[code]) / cnt
 
         # 판매량: 여러 게임에서 참조된 값 중 최댓값 사용 (데이터 일관성)
-        copies_sold = max((x["copiesSold"] for x in items), default=0)
-        revenue = max((x["revenue"] for x in items), default=0)
-        ccu = max((x["ccu"] for x in items), default=0)
+        copies_sold = int(copies_max[code])
+        revenue = float(revenue_max[code])
+        ccu = float(ccu_max[code])
 
         # 추정 공유 유저 = avg_link × 외부 게임 판매량
         reach_score = avg_link * copies_sold
@@ -676,8 +1195,8 @@ def get_audience_overlap_top(
         overlap_pct = round(cnt / total_games * 100, 1) if total_games > 0 else 0
 
         result.append({
-            "steamId": sid,
-            "name": items[0]["name"],
+            "steamId": rec["sids"][code],
+            "name": rec["name"][first_row],
             "overlap_game_count": cnt,
             "overlap_pct": overlap_pct,
             "avg_link": round(avg_link, 3),
@@ -685,7 +1204,7 @@ def get_audience_overlap_top(
             "revenue": revenue,
             "ccu": ccu,
             "reach_score": reach_score,
-            "genres": items[0]["genres"],
+            "genres": rec["genres"][first_row],
         })
 
     sort_keys = {
@@ -695,9 +1214,10 @@ def get_audience_overlap_top(
         "copies_sold": lambda x: x["copies_sold"],
     }
     key_fn = sort_keys.get(sort_by, sort_keys["reach_score"])
-    return sorted(result, key=key_fn, reverse=True)[:top_n]
+    return heapq.nlargest(top_n, result, key=key_fn)
 
 
+@_cache_aggregate
 def summarize_full_for_claude(
     games: list[dict],
     selected_metrics: list[str],
@@ -713,14 +1233,16 @@ def summarize_full_for_claude(
         return "데이터 없음"
 
     # 기본 통계
-    revenues = [g.get("revenue") or 0 for g in games]
-    sales = [g.get("copiesSold") or 0 for g in games]
+    cols = _game_columns()
+    idx = _positions(games)
+    total_revenue = float(cols["revenue"][idx].sum())
+    total_sales = int(cols["copiesSold"][idx].sum())
 
     lines.append(f"## 기본 통계 (총 {total}개 게임)")
-    lines.append(f"- 총 수익: ${sum(revenues):,.0f}")
-    lines.append(f"- 총 판매량: {sum(sales):,}장")
-    lines.append(f"- 평균 수익: ${sum(revenues)/total:,.0f}")
-    lines.append(f"- 평균 판매량: {sum(sales)/total:,.0f}장")
+    lines.append(f"- 총 수익: ${total_revenue:,.0f}")
+    lines.append(f"- 총 판매량: {total_sales:,}장")
+    lines.append(f"- 평균 수익: ${total_revenue/total:,.0f}")
+    lines.append(f"- 평균 판매량: {total_sales/total:,.0f}장")
 
     # 유저 활동 지표
     if "유저 활동 지표" in selected_metrics:
@@ -775,22 +1297,12 @@ def summarize_full_for_claude(
             )
 
     # 상위 게임 목록
-    top_games = sorted(games, key=lambda x: x.get("revenue") or 0, reverse=True)[:max_games]
+    top_games = heapq.nlargest(max_games, games, key=lambda x: x.get("revenue") or 0)
     lines.append(f"\n## 상위 {len(top_games)}개 게임")
-    for i, g in enumerate(top_games, 1):
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts) / 1000).year if ts else "?"
-        line = (
-            f"{i}. {g.get('name', '?')} ({yr}) | "
-            f"수익 ${(g.get('revenue') or 0):,.0f} | "
-            f"판매 {(g.get('copiesSold') or 0):,}장 | "
-            f"점수 {g.get('reviewScore', 0)}"
-        )
-        if "유저 활동 지표" in selected_metrics:
-            line += (
-                f" | "
-                f"플레이타임 {(g.get('avgPlaytime') or 0):.0f}h"
-            )
-        lines.append(line)
+    with_playtime = "유저 활동 지표" in selected_metrics
+    lines.extend(
+        _top_game_line(i, g, score_label="점수 {}", with_playtime=with_playtime)
+        for i, g in enumerate(top_games, 1)
+    )
 
     return "\n".join(lines)
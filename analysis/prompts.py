@@ -1,7 +1,27 @@
 """
 분석 유형별 시스템 프롬프트 + 사용자 프롬프트 빌더.
 """
-from analysis.data_loader import _parse_field
+import heapq
+import json
+from itertools import islice
+from operator import itemgetter
+
+import numpy as np
+import streamlit as st
+
+try:
+    import orjson
+except ImportError:  # 미설치 시 표준 json 사용
+    orjson = None
+
+from analysis.data_loader import (
+    _games_cache_key, _release_year, _release_month,
+    _game_columns, _positions, _country_matrix, _playtime_matrix, _rank_seen_columns,
+    get_tag_stats,
+)
+
+# 프롬프트 빌더 캐시 (입력이 같으면 재실행 시 문자열 조립 생략)
+_cache_prompt = st.cache_data(max_entries=16, show_spinner=False, hash_funcs={list: _games_cache_key})
 
 SYSTEM_PROMPT = """당신은 Steam 게임 시장 전문 애널리스트입니다.
 
@@ -16,21 +36,31 @@ Gamalytic API로 수집한 실제 Steam 게임 데이터를 기반으로 분석
 5. 마크다운 형식(헤더, 불릿, 강조)을 활용하세요"""
 
 
+# 상위 게임 행 템플릿 (빌더별, 모듈 로드 시 1회 생성)
+_TREND_GAME_ROW = "  {i}. {name} ({yr}) | 수익 ${revenue:,.0f} | 판매 {sales:,}장 | 리뷰 {score}/100".format
+_MARKET_GAME_ROW = "  {i}. {name} ({yr}) | 수익 ${revenue:,.0f} | 판매 {sales:,}장".format
+_DEV_GAME_ROW = (
+    "  {i}. {name} ({yr}) | 가격 ${price} | 수익 ${revenue:,.0f} | 판매 {sales:,}장 | "
+    "리뷰 {score}/100 | 플레이타임 {playtime:.0f}시간"
+).format
+
+
+@_cache_prompt
 def build_genre_trend_prompt(
     selected: list[str],
     yearly_data: dict,
     top_games: list[dict],
     genre_stats: dict,
     user_question: str = "",
+    extra_data: str = "",
 ) -> str:
-    """장르/태그 KPI 트렌드 분석 프롬프트."""
+    """장르/태그 KPI 트렌드 분석 프롬프트. extra_data: '## 추가 데이터' 섹션 본문 (없으면 생략)."""
     selected_str = ", ".join(selected) if selected else "전체"
 
     # 연도별 트렌드 포맷
     trend_lines = []
-    for yr, data in sorted(yearly_data.items()):
-        if yr < 2015:
-            continue
+    for yr in sorted(y for y in yearly_data if y >= 2015):
+        data = yearly_data[yr]
         trend_lines.append(
             f"  {yr}년: 수익 ${data['revenue']:,.0f} | "
             f"판매 {data['sales']:,}장 | "
@@ -38,21 +68,18 @@ def build_genre_trend_prompt(
         )
 
     # 상위 게임 목록
-    game_lines = []
-    for i, g in enumerate(top_games[:20], 1):
-        from datetime import datetime
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts) / 1000).year if ts else "?"
-        game_lines.append(
-            f"  {i}. {g.get('name', '?')} ({yr}) | "
-            f"수익 ${(g.get('revenue') or 0):,.0f} | "
-            f"판매 {(g.get('copiesSold') or 0):,}장 | "
-            f"리뷰 {g.get('reviewScore', 0)}/100"
+    game_lines = [
+        _TREND_GAME_ROW(
+            i=i, name=g.get("name", "?"), yr=_release_year(g) or "?",
+            revenue=g.get("revenue") or 0, sales=g.get("copiesSold") or 0,
+            score=g.get("reviewScore", 0),
         )
+        for i, g in enumerate(top_games[:20], 1)
+    ]
 
     # 장르/태그 통계
     stat_lines = []
-    for name, stat in list(genre_stats.items())[:10]:
+    for name, stat in islice(genre_stats.items(), 10):
         stat_lines.append(
             f"  - {name}: {stat['game_count']}개 게임, "
             f"평균 수익 ${stat['avg_revenue']:,.0f}, "
@@ -60,6 +87,7 @@ def build_genre_trend_prompt(
         )
 
     question_section = f"\n## 사용자 질문\n{user_question}" if user_question else ""
+    extra_section = f"## 추가 데이터\n{extra_data}\n\n" if extra_data else ""
 
     return f"""# {selected_str} 장르/태그 KPI 트렌드 분석 요청
 
@@ -77,7 +105,7 @@ def build_genre_trend_prompt(
 {chr(10).join(stat_lines) if stat_lines else "데이터 없음"}
 {question_section}
 
-## 분석 요청
+{extra_section}## 분석 요청
 위 데이터를 바탕으로 다음을 분석해주세요:
 1. **트렌드 핵심 요약**: 이 장르/태그의 시장 성장 또는 쇠퇴 패턴
 2. **성공 요인 분석**: 상위 게임들의 공통점과 차별점
@@ -88,16 +116,16 @@ def build_genre_trend_prompt(
 한국어로 답변해주세요."""
 
 
+@_cache_prompt
 def build_market_overview_prompt(
     period_label: str,
     games: list[dict],
     monthly_data: list[dict],
     genre_dist: dict,
     user_question: str = "",
+    extra_data: str = "",
 ) -> str:
-    """시장 현황 분석 프롬프트."""
-    from datetime import datetime
-
+    """시장 현황 분석 프롬프트. extra_data: '## 추가 데이터' 섹션 본문 (없으면 생략)."""
     total = len(games)
     revenues = [g.get("revenue") or 0 for g in games]
     sales = [g.get("copiesSold") or 0 for g in games]
@@ -107,16 +135,14 @@ def build_market_overview_prompt(
     hit_count = sum(1 for s in sales if s >= 1_000_000)
 
     # 상위 10개 게임
-    top_games = sorted(games, key=lambda x: x.get("revenue") or 0, reverse=True)[:15]
-    top_lines = []
-    for i, g in enumerate(top_games, 1):
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts) / 1000).strftime("%Y-%m") if ts else "?"
-        top_lines.append(
-            f"  {i}. {g.get('name', '?')} ({yr}) | "
-            f"수익 ${(g.get('revenue') or 0):,.0f} | "
-            f"판매 {(g.get('copiesSold') or 0):,}장"
+    top_games = heapq.nlargest(15, ((g.get("revenue") or 0, g) for g in games), key=itemgetter(0))
+    top_lines = [
+        _MARKET_GAME_ROW(
+            i=i, name=g.get("name", "?"), yr=_release_month(g) or "?",
+            revenue=revenue, sales=g.get("copiesSold") or 0,
         )
+        for i, (revenue, g) in enumerate(top_games, 1)
+    ]
 
     # 월별 출시 (최근 12개)
     monthly_lines = []
@@ -125,13 +151,14 @@ def build_market_overview_prompt(
 
     # 장르 분포 (상위 8개)
     genre_lines = []
-    for genre, stat in list(genre_dist.items())[:8]:
+    for genre, stat in islice(genre_dist.items(), 8):
         genre_lines.append(
             f"  - {genre}: {stat['game_count']}개, "
             f"총 수익 ${stat['total_revenue']:,.0f}"
         )
 
     question_section = f"\n## 사용자 질문\n{user_question}" if user_question else ""
+    extra_section = f"## 추가 데이터\n{extra_data}\n\n" if extra_data else ""
 
     return f"""# {period_label} Steam 시장 현황 분석 요청
 
@@ -151,7 +178,7 @@ def build_market_overview_prompt(
 {chr(10).join(top_lines) if top_lines else "데이터 없음"}
 {question_section}
 
-## 분석 요청
+{extra_section}## 분석 요청
 위 데이터를 바탕으로 다음을 분석해주세요:
 1. **시장 현황 요약**: 해당 기간 Steam 시장의 핵심 특징
 2. **주목할 트렌드**: 성장 중인 장르와 쇠퇴 중인 장르
@@ -162,6 +189,7 @@ def build_market_overview_prompt(
 한국어로 답변해주세요."""
 
 
+@_cache_prompt
 def build_dev_guide_prompt(
     target: list[str],
     scale: str,
@@ -170,38 +198,43 @@ def build_dev_guide_prompt(
     price_data: list[dict],
     common_tags: list[tuple],
     user_question: str = "",
+    extra_data: str = "",
 ) -> str:
-    """신규 게임 개발 전략 가이드 프롬프트."""
-    from datetime import datetime
-
+    """신규 게임 개발 전략 가이드 프롬프트. extra_data: '## 추가 데이터' 섹션 본문 (없으면 생략)."""
     target_str = ", ".join(target) if target else "전체"
     total = len(games)
 
-    revenues = [g.get("revenue") or 0 for g in games]
-    sales = [g.get("copiesSold") or 0 for g in games]
-    scores = [g.get("reviewScore") or 0 for g in games if g.get("reviewScore")]
-    playtimes = [g.get("avgPlaytime") or 0 for g in games if g.get("avgPlaytime")]
-
-    avg_revenue = sum(revenues) / total if total else 0
-    avg_sales = sum(sales) / total if total else 0
-    avg_score = sum(scores) / len(scores) if scores else 0
-    avg_playtime = sum(playtimes) / len(playtimes) if playtimes else 0
+    # 합계·평균 (단일 순회)
+    sum_revenue = sum_sales = sum_score = sum_playtime = 0
+    n_score = n_playtime = 0
+    for g in games:
+        sum_revenue += g.get("revenue") or 0
+        sum_sales += g.get("copiesSold") or 0
+        score = g.get("reviewScore")
+        if score:
+            sum_score += score
+            n_score += 1
+        playtime = g.get("avgPlaytime")
+        if playtime:
+            sum_playtime += playtime
+            n_playtime += 1
+
+    avg_revenue = sum_revenue / total if total else 0
+    avg_sales = sum_sales / total if total else 0
+    avg_score = sum_score / n_score if n_score else 0
+    avg_playtime = sum_playtime / n_playtime if n_playtime else 0
 
     # 상위 성공작
-    top_games = sorted(games, key=lambda x: x.get("revenue") or 0, reverse=True)[:20]
-    top_lines = []
-    for i, g in enumerate(top_games, 1):
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts) / 1000).year if ts else "?"
-        price = g.get("price") or 0
-        top_lines.append(
-            f"  {i}. {g.get('name', '?')} ({yr}) | "
-            f"가격 ${price} | "
-            f"수익 ${(g.get('revenue') or 0):,.0f} | "
-            f"판매 {(g.get('copiesSold') or 0):,}장 | "
-            f"리뷰 {g.get('reviewScore', 0)}/100 | "
-            f"플레이타임 {(g.get('avgPlaytime') or 0):.0f}시간"
+    top_games = heapq.nlargest(20, ((g.get("revenue") or 0, g) for g in games), key=itemgetter(0))
+    top_lines = [
+        _DEV_GAME_ROW(
+            i=i, name=g.get("name", "?"), yr=_release_year(g) or "?",
+            price=g.get("price") or 0, revenue=revenue,
+            sales=g.get("copiesSold") or 0, score=g.get("reviewScore", 0),
+            playtime=g.get("avgPlaytime") or 0,
         )
+        for i, (revenue, g) in enumerate(top_games, 1)
+    ]
 
     # 공통 태그
     tag_lines = [f"  {tag}: {cnt}개 게임" for tag, cnt in common_tags[:15]]
@@ -226,6 +259,7 @@ def build_dev_guide_prompt(
 
     question_section = f"\n## 추가 조건\n{extra_conditions}" if extra_conditions else ""
     user_q_section = f"\n## 질문\n{user_question}" if user_question else ""
+    extra_section = f"## 추가 데이터\n{extra_data}\n\n" if extra_data else ""
 
     return f"""# {target_str} 게임 개발 전략 가이드 요청
 
@@ -251,7 +285,7 @@ def build_dev_guide_prompt(
 {chr(10).join(top_lines) if top_lines else "데이터 없음"}
 {user_q_section}
 
-## 분석 요청
+{extra_section}## 분석 요청
 위 데이터를 바탕으로 {scale} 규모 {target_str} 게임 개발을 위한 전략 가이드를 제공해주세요:
 
 1. **시장 진입 전략**: 현재 시장 포화도와 차별화 방향
@@ -281,6 +315,13 @@ SYSTEM_PROMPT_REPORT = """당신은 Steam 게임 시장 전문 애널리스트
 7. 데이터에 기반한 구체적인 수치를 반드시 포함하세요"""
 
 
+def _dumps_compact(obj) -> str:
+    """프롬프트용 JSON 직렬화 (공백 없는 compact 형식, orjson 우선)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
 def build_custom_report_prompt(
     user_prompt: str,
     filtered_games: list[dict],
@@ -289,126 +330,108 @@ def build_custom_report_prompt(
     yearly_trends: dict | None = None,
 ) -> str:
     """커스텀 HTML 리포트 생성 프롬프트."""
-    import json as _json
-    from datetime import datetime
     from collections import Counter, defaultdict
 
     total = len(filtered_games)
     if total == 0:
         return "데이터가 없습니다."
 
+    # 지표 라벨 → (게임 필드, 데이터 패키지용 약어 키)
     FIELD_MAP = {
-        "판매량": "copiesSold",
-        "수익": "revenue",
-        "리뷰점수": "reviewScore",
-        "리뷰수": "reviews",
-        "평균플레이타임": "avgPlaytime",
-        "가격": "price",
-        "팔로워": "followers",
-        "위시리스트": "wishlists",
-        "현재플레이어CCU": "players",
-        "오너수": "owners",
+        "판매량": ("copiesSold", "cs"),
+        "수익": ("revenue", "rv"),
+        "리뷰점수": ("reviewScore", "sc"),
+        "리뷰수": ("reviews", "rc"),
+        "평균플레이타임": ("avgPlaytime", "pt"),
+        "가격": ("price", "pr"),
+        "팔로워": ("followers", "fo"),
+        "위시리스트": ("wishlists", "wl"),
+        "현재플레이어CCU": ("players", "cc"),
+        "오너수": ("owners", "ow"),
     }
 
     # 선택 필드 결정 (없으면 전체)
-    active_fields = {k: v for k, v in FIELD_MAP.items()
-                     if not selected_fields or k in selected_fields}
-
-    import math
-
-    def _clean(v):
-        """None / NaN / Inf → 0으로 정규화."""
-        if v is None:
-            return 0
-        try:
-            f = float(v)
-            return 0 if not math.isfinite(f) else f
-        except (TypeError, ValueError):
-            return 0
-
-    def safe_avg(vals):
-        vals = [x for x in vals if x and math.isfinite(float(x))]
-        return sum(vals) / len(vals) if vals else 0
-
-    # 집계 통계
+    active_fields = {code: field for label, (field, code) in FIELD_MAP.items()
+                     if not selected_fields or label in selected_fields}
+    legend = ", ".join(f"{code}={label}" for label, (_, code) in FIELD_MAP.items()
+                       if code in active_fields)
+
+    cols = _game_columns()
+    idx = _positions(filtered_games)
+
+    # 집계 통계 (캐시된 수치 컬럼 벡터 연산, NaN/Inf → 0)
     agg = {}
-    for label, field in active_fields.items():
-        vals = [_clean(g.get(field)) for g in filtered_games]
-        agg[label] = {
-            "total": round(sum(vals)),
-            "average": round(safe_avg(vals)),
-            "max": round(max(vals)) if vals else 0,
-            "max_game": next(
-                (g.get("name", "?") for g in filtered_games
-                 if (g.get(field) or 0) == max(vals)), "?"
-            ) if vals else "?",
+    for code, field in active_fields.items():
+        vals = cols[field][idx].astype(np.float64)
+        vals[~np.isfinite(vals)] = 0
+        nonzero = vals[vals != 0]
+        top = int(vals.argmax())
+        agg[code] = {
+            "total": round(vals.sum().item()),
+            "average": round(nonzero.mean().item()) if len(nonzero) else 0,
+            "max": round(vals[top].item()),
+            "max_game": filtered_games[top].get("name", "?"),
         }
 
     # 장르 분포
     genre_count: Counter = Counter()
     genre_rev: dict = defaultdict(float)
     for g in filtered_games:
+        revenue = g.get("revenue") or 0
         for genre in (g.get("genres") or []):
             genre_count[genre] += 1
-            genre_rev[genre] += g.get("revenue") or 0
-
-    # 태그 분포
-    tag_count: Counter = Counter()
-    for g in filtered_games:
-        for tag in (g.get("tags") or []):
-            tag_count[tag] += 1
-
-    # 국가별 집계
-    country_agg: dict = defaultdict(float)
-    for g in filtered_games:
-        cd = _parse_field(g.get("countryData"), default={})
-        if isinstance(cd, dict):
-            for country, pct in cd.items():
-                country_agg[country] += pct
-    top_countries = dict(sorted(country_agg.items(), key=lambda x: x[1], reverse=True)[:10])
-
-    # 플레이타임 분포 평균
-    pt_buckets: dict = defaultdict(float)
-    for g in filtered_games:
-        pd_data = _parse_field(g.get("playtimeData"), default={})
-        dist = pd_data.get("distribution") or {}
-        for bucket, pct in dist.items():
-            pt_buckets[bucket] += pct
-    avg_pt_dist = {k: round(v / total, 1) for k, v in pt_buckets.items()}
+            genre_rev[genre] += revenue
+
+    # 플레이타임 분포 (캐시된 구간 행렬, 등장 순)
+    buckets, pt_mat, pt_present = _playtime_matrix()
+    seen = pt_present[idx]
+    cols = np.flatnonzero(seen.any(axis=0))
+    cols = cols[np.argsort(seen[:, cols].argmax(axis=0), kind="stable")]
+    pt_sum = pt_mat[idx].sum(axis=0)
+    avg_pt_dist = {buckets[j]: round(pt_sum[j].item() / total, 1) for j in cols.tolist()}
+
+    # 태그 Top 20 (게임 수 순)
+    tag_stats = get_tag_stats(filtered_games)
+    top_tags = {tag: stat["game_count"] for tag, stat in islice(tag_stats.items(), 20)}
+
+    # 국가별 비율 합계 Top 10
+    codes, pct_mat, present = _country_matrix()
+    country_sum = pct_mat[idx].sum(axis=0)
+    ranked = _rank_seen_columns(present[idx], country_sum)[:10]
+    top_countries = {codes[j]: val for j, val in zip(ranked.tolist(), country_sum[ranked].tolist())}
 
     # 상위 30개 게임
-    top_games = sorted(filtered_games, key=lambda x: x.get("revenue") or 0, reverse=True)[:30]
+    top_games = heapq.nlargest(30, filtered_games, key=lambda x: x.get("revenue") or 0)
     game_rows = []
     for i, g in enumerate(top_games, 1):
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts) / 1000).year if ts else "?"
+        yr = _release_year(g) or "?"
         row = {"rank": i, "name": g.get("name", "?"), "year": yr,
                "genres": (g.get("genres") or [])[:3],
                "tags": (g.get("tags") or [])[:5]}
-        for label, field in active_fields.items():
-            row[label] = g.get(field) or 0
+        for code, field in active_fields.items():
+            row[code] = g.get(field) or 0
         game_rows.append(row)
 
     # 연도별 트렌드
     trend_data = {}
     if yearly_trends:
-        for yr, data in sorted(yearly_trends.items()):
-            if yr >= 2015:
-                trend_data[str(yr)] = {
-                    "revenue": round(data.get("revenue", 0)),
-                    "sales": round(data.get("sales", 0)),
-                    "game_count": data.get("game_count", 0),
-                }
+        for yr in sorted(y for y in yearly_trends if y >= 2015):
+            data = yearly_trends[yr]
+            trend_data[str(yr)] = {
+                "revenue": round(data.get("revenue", 0)),
+                "sales": round(data.get("sales", 0)),
+                "game_count": data.get("game_count", 0),
+            }
 
     data_package = {
         "filter_summary": filter_summary,
         "total_games": total,
         "aggregate_stats": agg,
         "genre_distribution": {
-            g: {"count": genre_count[g], "total_revenue": round(genre_rev[g])}
-            for g in list(genre_count.keys())[:12]
+            g: {"count": cnt, "total_revenue": round(genre_rev[g])}
+            for g, cnt in genre_count.most_common(12)
         },
-        "top_tags": dict(tag_count.most_common(20)),
+        "top_tags": top_tags,
         "top_countries": top_countries,
         "playtime_distribution_avg_pct": avg_pt_dist,
         "yearly_trends": trend_data,
@@ -424,8 +447,9 @@ def build_custom_report_prompt(
 {filter_summary}
 
 ## 데이터
+지표 약어: {legend}
 ```json
-{_json.dumps(data_package, ensure_ascii=False, indent=2)}
+{_dumps_compact(data_package)}
 ```
 
 ## HTML 보고서 요구사항
@@ -443,6 +467,7 @@ def build_custom_report_prompt(
 - 상위 30개 게임 상세 테이블 (선택된 데이터 항목 열)
 - 주요 발견사항 및 전략적 시사점 섹션
 - 모든 텍스트는 한국어
+- 표와 카드에는 지표 약어 대신 한국어 지표명 표기
 - 리포트 제목은 분석 내용을 반영해 자동 생성
 
 오직 HTML 코드만 반환하세요. 앞뒤 설명 없이 <!DOCTYPE html>로 시작하세요."""
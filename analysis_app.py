@@ -37,7 +37,7 @@ with st.sidebar:
     st.divider()
 
     # API 키 상태
-    from analysis.claude_client import check_api_key
+    from analysis.claude_client import check_api_key, get_response_cache_stats
     ok, msg = check_api_key()
     if ok:
         st.success(f"✅ Claude API: {msg}")
@@ -45,6 +45,15 @@ with st.sidebar:
         st.error(f"❌ Claude API: {msg}")
         st.info("`.env` 파일에 `ANTHROPIC_API_KEY`를 설정하세요.")
 
+    # 응답 캐시 적중률
+    cache_stats = get_response_cache_stats()
+    cache_total = cache_stats["hits"] + cache_stats["misses"]
+    if cache_total:
+        st.caption(
+            f"응답 캐시: 적중 {cache_stats['hits']}/{cache_total}회 "
+            f"({cache_stats['hits'] / cache_total:.0%}) · 저장 {cache_stats['size']}건"
+        )
+
     st.divider()
     st.markdown("**페이지 목록**")
     st.page_link("pages/1_장르_KPI_트렌드.py", label="장르 KPI 트렌드", icon="📈")
@@ -58,7 +67,7 @@ st.caption("Gamalytic API 수집 데이터 × Claude AI 심층 분석")
 st.divider()
 
 # 데이터 로드
-from analysis.data_loader import load_all_games, get_genre_stats, get_yearly_trends, _release_year
+from analysis.data_loader import load_all_games, get_genre_stats, get_yearly_trends, get_overview_stats
 
 with st.spinner("데이터 로딩 중..."):
     games = load_all_games()
@@ -68,14 +77,13 @@ if not games:
     st.stop()
 
 # ── 주요 지표 카드 ────────────────────────────────────────
-total_games = len(games)
-total_revenue = sum(g.get("revenue") or 0 for g in games)
-total_sales = sum(g.get("copiesSold") or 0 for g in games)
-hit_count = sum(1 for g in games if (g.get("copiesSold") or 0) >= 1_000_000)
-
-release_years = [_release_year(g) for g in games if _release_year(g)]
-year_min = min(release_years) if release_years else 0
-year_max = max(release_years) if release_years else 0
+overview = get_overview_stats(games)
+total_games = overview["total_games"]
+total_revenue = overview["total_revenue"]
+total_sales = overview["total_sales"]
+hit_count = overview["hit_count"]
+year_min = overview["year_min"]
+year_max = overview["year_max"]
 
 col1, col2, col3, col4, col5 = st.columns(5)
 with col1:
@@ -165,22 +173,28 @@ st.divider()
 # ── 장르별 현황 미리보기 ──────────────────────────────────
 st.subheader("🎯 장르별 시장 현황 (상위 10개)")
 
-genre_stats = get_genre_stats(games)
 import pandas as pd
+from analysis.data_loader import _cache_aggregate
+
+
+@_cache_aggregate
+def _genre_preview_df(games: list[dict]) -> pd.DataFrame:
+    """장르 상위 10개 미리보기 표 (포맷 문자열까지 캐시)."""
+    genre_rows = []
+    for genre, stat in list(get_genre_stats(games).items())[:10]:
+        genre_rows.append({
+            "장르": genre,
+            "게임 수": stat["game_count"],
+            "평균 수익 ($)": f"${stat['avg_revenue']:,.0f}",
+            "평균 판매량": f"{stat['avg_sales']:,.0f}장",
+            "평균 리뷰 점수": f"{stat['avg_score']:.1f}/100",
+            "총 수익 ($)": f"${stat['total_revenue']:,.0f}",
+        })
+    return pd.DataFrame(genre_rows)
 
-genre_rows = []
-for genre, stat in list(genre_stats.items())[:10]:
-    genre_rows.append({
-        "장르": genre,
-        "게임 수": stat["game_count"],
-        "평균 수익 ($)": f"${stat['avg_revenue']:,.0f}",
-        "평균 판매량": f"{stat['avg_sales']:,.0f}장",
-        "평균 리뷰 점수": f"{stat['avg_score']:.1f}/100",
-        "총 수익 ($)": f"${stat['total_revenue']:,.0f}",
-    })
 
 st.dataframe(
-    pd.DataFrame(genre_rows),
+    _genre_preview_df(games),
     use_container_width=True,
     hide_index=True,
 )
@@ -1,10 +1,12 @@
 """
 장르/태그별 KPI 트렌드 + 유저 활동 + 시계열 히스토리 + 국가별 분포 페이지
 """
-import sys, os
+import sys, os, math
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from datetime import datetime
+import heapq
+from itertools import islice
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
@@ -17,17 +19,31 @@ st.set_page_config(page_title="장르 KPI 트렌드", page_icon="📈", layout="
 
 from analysis.data_loader import (
     load_all_games, filter_games,
-    get_yearly_trends, get_top_games,
+    get_yearly_trends, get_top_games, get_kpi_summary, get_numeric_columns, get_histogram,
     get_genre_stats, get_tag_stats,
     get_all_tags, get_all_genres,
-    get_history_aggregate, get_history_for_game,
-    get_country_aggregate, get_activity_summary,
+    get_history_aggregate_df, get_history_for_game, downsample_lttb,
+    get_country_aggregate, get_activity_summary, get_playtime_distribution,
     get_audience_overlap_top, summarize_full_for_claude,
     _release_year, _parse_field,
 )
-from analysis.claude_client import stream_analysis, check_api_key
+from analysis.claude_client import stream_analysis, accumulate_stream, check_api_key
 from analysis.prompts import SYSTEM_PROMPT, build_genre_trend_prompt
 
+# 다크 테마 공통 레이아웃 (dict 기반 Figure에서 재사용)
+DARK_LAYOUT = {"plot_bgcolor": "#0e1117", "paper_bgcolor": "#0e1117", "font": {"color": "white"}}
+
+
+def _f32(values) -> np.ndarray:
+    """차트 전송용 float32 배열 (float64 대비 Plotly 직렬화 크기 절반)."""
+    return np.asarray(values, dtype=np.float32)
+
+
+# 단일 게임 히스토리 차트 최대 점 수 (초과 시 LTTB 다운샘플링)
+SG_MAX_POINTS = 2000
+# 단일 게임 선택 목록 최대 항목 수
+SG_NAME_LIMIT = 200
+
 # ── 데이터 로드 ───────────────────────────────────────────
 games = load_all_games()
 all_tags  = get_all_tags(games, min_count=5)
@@ -101,21 +117,20 @@ if not filtered:
     st.stop()
 
 # ── 요약 KPI 카드 ─────────────────────────────────────────
-revenues  = [g.get("revenue") or 0 for g in filtered]
-sales_lst = [g.get("copiesSold") or 0 for g in filtered]
-scores    = [g.get("reviewScore") or 0 for g in filtered if g.get("reviewScore")]
-playtimes = [g.get("avgPlaytime") or 0 for g in filtered if g.get("avgPlaytime")]
-wishlists = [g.get("wishlists") or 0 for g in filtered if g.get("wishlists")]
+kpi = get_kpi_summary(filtered)
 
 c1,c2,c3,c4,c5 = st.columns(5)
-c1.metric("게임 수",        f"{len(filtered):,}개")
-c2.metric("평균 수익",      f"${(sum(revenues)/len(revenues)/1e6):.1f}M" if revenues else "-")
-c3.metric("평균 판매량",    f"{(sum(sales_lst)/len(sales_lst)/1e6):.2f}M장" if sales_lst else "-")
-c4.metric("평균 리뷰 점수", f"{(sum(scores)/len(scores)):.1f}" if scores else "-")
-c5.metric("평균 플레이타임",f"{(sum(playtimes)/len(playtimes)):.0f}h" if playtimes else "-")
+c1.metric("게임 수",        f"{kpi['game_count']:,}개")
+c2.metric("평균 수익",      f"${kpi['avg_revenue']/1e6:.1f}M" if kpi["avg_revenue"] is not None else "-")
+c3.metric("평균 판매량",    f"{kpi['avg_sales']/1e6:.2f}M장" if kpi["avg_sales"] is not None else "-")
+c4.metric("평균 리뷰 점수", f"{kpi['avg_score']:.1f}" if kpi["avg_score"] is not None else "-")
+c5.metric("평균 플레이타임",f"{kpi['avg_playtime']:.0f}h" if kpi["avg_playtime"] is not None else "-")
 
 st.divider()
 
+# 판매·수익 탭과 AI 프롬프트가 함께 쓰는 연도별 집계 (1회 계산)
+yearly = get_yearly_trends(filtered)
+
 # ══════════════════════════════════════════════════════════
 # 탭 구성
 # ══════════════════════════════════════════════════════════
@@ -136,26 +151,26 @@ if show_sales and "💰 판매·수익" in tab_map:
     with tab_map["💰 판매·수익"]:
         st.subheader("연도별 수익·판매량 트렌드")
 
-        yearly = get_yearly_trends(filtered)
         years  = [yr for yr in sorted(yearly.keys()) if yr >= year_min]
         y_rev  = [yearly[yr]["revenue"] / 1e6 for yr in years]
         y_sal  = [yearly[yr]["sales"] / 1e6 for yr in years]
         y_cnt  = [yearly[yr]["game_count"] for yr in years]
 
-        fig = go.Figure()
-        fig.add_trace(go.Bar(x=years, y=y_rev, name="수익 증분 (백만$)",
-                             marker_color="rgba(79,195,247,0.8)"))
-        fig.add_trace(go.Scatter(x=years, y=y_sal, name="판매 증분 (백만장)",
-                                 line=dict(color="#ff7043", width=2),
-                                 mode="lines+markers", yaxis="y2"))
-        fig.add_trace(go.Scatter(x=years, y=y_cnt, name="활성 게임 수",
-                                 line=dict(color="#a5d6a7", width=1, dash="dot"),
-                                 mode="lines+markers", yaxis="y2"))
-        fig.update_layout(
-            yaxis=dict(title="수익 증분 (백만$)"),
-            yaxis2=dict(title="판매/게임 수", overlaying="y", side="right"),
-            legend=dict(orientation="h", y=1.12), height=380,
-            plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+        # 매 재실행마다 생성되는 차트 → dict trace + 검증 생략 (_validate=False)
+        fig = go.Figure(data=[
+            {"type": "bar", "x": years, "y": y_rev, "name": "수익 증분 (백만$)",
+             "marker": {"color": "rgba(79,195,247,0.8)"}},
+            {"type": "scatter", "x": years, "y": y_sal, "name": "판매 증분 (백만장)",
+             "line": {"color": "#ff7043", "width": 2},
+             "mode": "lines+markers", "yaxis": "y2"},
+            {"type": "scatter", "x": years, "y": y_cnt, "name": "활성 게임 수",
+             "line": {"color": "#a5d6a7", "width": 1, "dash": "dot"},
+             "mode": "lines+markers", "yaxis": "y2"},
+        ], layout={
+            "yaxis": {"title": {"text": "수익 증분 (백만$)"}},
+            "yaxis2": {"title": {"text": "판매/게임 수"}, "overlaying": "y", "side": "right"},
+            "legend": {"orientation": "h", "y": 1.12}, "height": 380, **DARK_LAYOUT,
+        }, _validate=False)
         st.plotly_chart(fig, width='stretch')
 
         # 상위 10개 수익 + 산점도
@@ -163,30 +178,31 @@ if show_sales and "💰 판매·수익" in tab_map:
         with col_l:
             st.subheader("상위 10개 게임 수익")
             top10 = get_top_games(filtered, 10, "revenue")
-            fig2 = go.Figure(go.Bar(
-                x=[(g.get("revenue") or 0)/1e6 for g in top10][::-1],
-                y=[g.get("name","")[:28] for g in top10][::-1],
-                orientation="h", marker_color="rgba(255,183,77,0.85)"))
-            fig2.update_layout(xaxis_title="수익 (백만$)", height=340,
-                plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+            fig2 = go.Figure(data=[{
+                "type": "bar",
+                "x": [(g.get("revenue") or 0)/1e6 for g in top10],
+                "y": [g.get("name","")[:28] for g in top10],
+                "orientation": "h", "marker": {"color": "rgba(255,183,77,0.85)"},
+            }], layout={"xaxis": {"title": {"text": "수익 (백만$)"}}, "yaxis": {"autorange": "reversed"},
+                     "height": 340, **DARK_LAYOUT},
+                _validate=False)
             st.plotly_chart(fig2, width='stretch')
 
         with col_r:
             st.subheader("출시연도 vs 수익 (버블=판매량)")
-            rows = []
-            for g in filtered:
-                ts = g.get("releaseDate") or g.get("firstReleaseDate")
-                if not ts: continue
-                rows.append({"name": g.get("name",""), "year": datetime.fromtimestamp(int(ts)/1000).year,
-                             "rev_m": (g.get("revenue") or 0)/1e6,
-                             "sal_m": (g.get("copiesSold") or 0)/1e6,
-                             "score": g.get("reviewScore") or 0})
-            if rows:
-                df = pd.DataFrame(rows)
+            # 캐시된 수치 컬럼에서 바로 DataFrame 구성 (게임별 row dict 생성 생략)
+            cols = get_numeric_columns(filtered, ["release_year", "revenue", "copiesSold", "reviewScore"])
+            dated = cols["release_year"] > 0
+            if dated.any():
+                names = np.array([g.get("name","") for g in filtered], dtype=object)
+                df = pd.DataFrame({"name": names[dated], "year": cols["release_year"][dated],
+                                   "rev_m": cols["revenue"][dated]/1e6,
+                                   "sal_m": cols["copiesSold"][dated]/1e6,
+                                   "score": cols["reviewScore"][dated]})
                 fig3 = px.scatter(df, x="year", y="rev_m", size="sal_m", color="score",
                                   hover_name="name", color_continuous_scale="Viridis",
                                   labels={"year":"출시연도","rev_m":"수익(백만$)","score":"리뷰점수"},
-                                  size_max=40)
+                                  size_max=40, render_mode="webgl")
                 fig3.update_layout(height=340, plot_bgcolor="#0e1117",
                     paper_bgcolor="#0e1117", font=dict(color="white"))
                 st.plotly_chart(fig3, width='stretch')
@@ -211,50 +227,56 @@ if show_activity and "👥 유저 활동" in tab_map:
                 f"{st_data.get('avg', 0):,.0f}{unit}"
             )
 
-        # 4개 분포 차트
+        # 4개 분포 차트 (캐시된 수치 컬럼 1회 조회)
+        act_cols = get_numeric_columns(filtered, ["wishlists", "avgPlaytime", "reviewScore"])
         col1, col2 = st.columns(2)
 
         with col1:
             st.markdown("**위시리스트 분포**")
-            wish_vals = [g.get("wishlists") or 0 for g in filtered if (g.get("wishlists") or 0) > 0]
-            if wish_vals:
-                fig_wish = go.Figure(go.Histogram(
-                    x=[v/1000 for v in wish_vals], nbinsx=30,
+            wish_vals = act_cols["wishlists"][act_cols["wishlists"] > 0]
+            if len(wish_vals):
+                centers, counts, width = get_histogram(wish_vals / 1000, 30)
+                fig_wish = go.Figure(go.Bar(
+                    x=centers, y=counts, width=width,
                     marker_color="rgba(79,195,247,0.8)"))
                 fig_wish.update_layout(xaxis_title="위시리스트 (천)", yaxis_title="게임 수",
                     height=300, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
                 st.plotly_chart(fig_wish, width='stretch')
 
             st.markdown("**팔로워 vs 수익 상관관계**")
-            rows = [{"name": g.get("name",""), "followers": g.get("followers") or 0,
-                     "revenue_m": (g.get("revenue") or 0)/1e6,
-                     "score": g.get("reviewScore") or 0}
-                    for g in filtered if g.get("followers")]
-            if rows:
-                df_f = pd.DataFrame(rows)
+            cols = get_numeric_columns(filtered, ["followers", "revenue", "reviewScore"])
+            has_fol = cols["followers"] != 0
+            if has_fol.any():
+                names = np.array([g.get("name","") for g in filtered], dtype=object)
+                df_f = pd.DataFrame({"name": names[has_fol], "followers": cols["followers"][has_fol],
+                                     "revenue_m": cols["revenue"][has_fol]/1e6,
+                                     "score": cols["reviewScore"][has_fol]})
                 fig_fol = px.scatter(df_f, x="followers", y="revenue_m", color="score",
                                      hover_name="name", color_continuous_scale="Blues",
-                                     labels={"followers":"팔로워","revenue_m":"수익(백만$)"}, size_max=12)
+                                     labels={"followers":"팔로워","revenue_m":"수익(백만$)"}, size_max=12,
+                                     render_mode="webgl")
                 fig_fol.update_layout(height=300, plot_bgcolor="#0e1117",
                     paper_bgcolor="#0e1117", font=dict(color="white"))
                 st.plotly_chart(fig_fol, width='stretch')
 
         with col2:
             st.markdown("**플레이타임 분포**")
-            pt_vals = [g.get("avgPlaytime") or 0 for g in filtered if (g.get("avgPlaytime") or 0) > 0]
-            if pt_vals:
-                fig_pt = go.Figure(go.Histogram(
-                    x=[v for v in pt_vals if v < 200], nbinsx=30,
+            pt_vals = act_cols["avgPlaytime"][act_cols["avgPlaytime"] > 0]
+            if len(pt_vals):
+                centers, counts, width = get_histogram(pt_vals[pt_vals < 200], 30, (0, 200))
+                fig_pt = go.Figure(go.Bar(
+                    x=centers, y=counts, width=width,
                     marker_color="rgba(255,183,77,0.8)"))
                 fig_pt.update_layout(xaxis_title="평균 플레이타임 (시간)", yaxis_title="게임 수",
                     height=300, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
                 st.plotly_chart(fig_pt, width='stretch')
 
             st.markdown("**리뷰 점수 분포**")
-            score_vals = [g.get("reviewScore") or 0 for g in filtered if g.get("reviewScore")]
-            if score_vals:
-                fig_sc = go.Figure(go.Histogram(
-                    x=score_vals, nbinsx=20,
+            score_vals = act_cols["reviewScore"][act_cols["reviewScore"] != 0]
+            if len(score_vals):
+                centers, counts, width = get_histogram(score_vals, 20)
+                fig_sc = go.Figure(go.Bar(
+                    x=centers, y=counts, width=width,
                     marker_color="rgba(165,214,167,0.8)"))
                 fig_sc.update_layout(xaxis_title="리뷰 점수", yaxis_title="게임 수",
                     height=300, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
@@ -262,18 +284,11 @@ if show_activity and "👥 유저 활동" in tab_map:
 
         # 플레이타임 구간 분포 (전체 집계)
         st.markdown("**플레이타임 구간별 유저 비율 (전체 평균)**")
-        bucket_sums = {}
-        cnt = 0
-        for g in filtered:
-            dist = (_parse_field(g.get("playtimeData"), default={}) or {}).get("distribution") or {}
-            if dist:
-                for b, pct in dist.items():
-                    bucket_sums[b] = bucket_sums.get(b, 0) + pct
-                cnt += 1
-        if bucket_sums and cnt:
+        pt_dist = get_playtime_distribution(filtered)
+        if pt_dist:
             order = ["0-1h","1-2h","2-5h","5-10h","10-20h","20-50h","50-100h","100-500h","500-1000h"]
-            bkts  = [b for b in order if b in bucket_sums]
-            avgs  = [round(bucket_sums[b]/cnt, 1) for b in bkts]
+            bkts = [b for b in order if b in pt_dist]
+            avgs = [round(pt_dist[b], 1) for b in bkts]
             fig_pt_dist = go.Figure(go.Bar(x=bkts, y=avgs, marker_color="rgba(206,147,216,0.85)"))
             fig_pt_dist.update_layout(xaxis_title="플레이타임 구간", yaxis_title="평균 비율 (%)",
                 height=280, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
@@ -281,7 +296,7 @@ if show_activity and "👥 유저 활동" in tab_map:
 
         # 팔로워 상위 10
         st.markdown("**팔로워 상위 10개 게임**")
-        top_fol = sorted(filtered, key=lambda x: x.get("followers") or 0, reverse=True)[:10]
+        top_fol = get_top_games(filtered, 10, "followers")
         fol_rows = [{"게임명": g.get("name",""),
                      "팔로워": f"{(g.get('followers') or 0):,.0f}",
                      "위시리스트": f"{(g.get('wishlists') or 0):,.0f}",
@@ -292,81 +307,75 @@ if show_activity and "👥 유저 활동" in tab_map:
 
 # ── 탭: 시계열 히스토리 ───────────────────────────────────
 if show_history and "📅 시계열 히스토리" in tab_map:
-    with tab_map["📅 시계열 히스토리"]:
+    @st.fragment
+    def _history_tab():
         st.subheader("시계열 히스토리 (연도별 집계)")
 
         hist_freq = st.radio("집계 단위", ["yearly", "monthly"], horizontal=True,
                              format_func=lambda x: "연도별" if x=="yearly" else "월별",
                              key="hist_freq")
-        hist_data = get_history_aggregate(filtered, freq=hist_freq,
-                                          year_min=year_min, year_max=year_max)
+        df_h = get_history_aggregate_df(filtered, freq=hist_freq,
+                                        year_min=year_min, year_max=year_max)
 
-        if not hist_data:
+        if df_h.empty:
             st.info("히스토리 데이터가 없습니다.")
         else:
-            periods = list(hist_data.keys())
-            df_h = pd.DataFrame([{"period": p, **v} for p, v in hist_data.items()])
 
             metric_opt = st.selectbox("차트 지표 선택", [
                 "판매 증분 + 수익 증분", "CCU (동시접속)", "리뷰 점수",
                 "평균 플레이타임", "평균 가격", "팔로워"
             ], key="hist_metric")
 
+            # 지표별 trace dict → 검증 생략 Figure (_validate=False)
+            x_h = df_h.period.tolist()
+            h_layout = {"height": 380, **DARK_LAYOUT}
             if metric_opt == "판매 증분 + 수익 증분":
-                fig_h = go.Figure()
-                fig_h.add_trace(go.Bar(x=df_h.period, y=df_h.revenue_inc/1e6,
-                                       name="수익 증분 (백만$)", marker_color="rgba(79,195,247,0.8)"))
-                fig_h.add_trace(go.Scatter(x=df_h.period, y=df_h.sales_inc/1e6,
-                                           name="판매 증분 (백만장)",
-                                           line=dict(color="#ff7043",width=2), yaxis="y2"))
-                fig_h.update_layout(yaxis=dict(title="수익(백만$)"),
-                                    yaxis2=dict(title="판매(백만장)",overlaying="y",side="right"),
-                                    height=380, plot_bgcolor="#0e1117",
-                                    paper_bgcolor="#0e1117", font=dict(color="white"),
-                                    legend=dict(orientation="h",y=1.12))
+                h_traces = [
+                    {"type": "bar", "x": x_h, "y": _f32(df_h.revenue_inc/1e6),
+                     "name": "수익 증분 (백만$)", "marker": {"color": "rgba(79,195,247,0.8)"}},
+                    {"type": "scatter", "x": x_h, "y": _f32(df_h.sales_inc/1e6),
+                     "name": "판매 증분 (백만장)",
+                     "line": {"color": "#ff7043", "width": 2}, "yaxis": "y2"},
+                ]
+                h_layout.update(yaxis={"title": {"text": "수익(백만$)"}},
+                                yaxis2={"title": {"text": "판매(백만장)"}, "overlaying": "y", "side": "right"},
+                                legend={"orientation": "h", "y": 1.12})
 
             elif metric_opt == "CCU (동시접속)":
-                fig_h = go.Figure()
-                fig_h.add_trace(go.Scatter(x=df_h.period, y=df_h.avg_ccu,
-                                           name="평균 CCU", line=dict(color="#4fc3f7",width=2),
-                                           mode="lines+markers", fill="tozeroy",
-                                           fillcolor="rgba(79,195,247,0.15)"))
-                fig_h.add_trace(go.Scatter(x=df_h.period, y=df_h.max_ccu,
-                                           name="최대 CCU (최상위 게임)", line=dict(color="#ff7043",width=1,dash="dot"),
-                                           mode="lines"))
-                fig_h.update_layout(yaxis_title="CCU", height=380,
-                                    plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                    font=dict(color="white"), legend=dict(orientation="h",y=1.12))
+                h_traces = [
+                    {"type": "scatter", "x": x_h, "y": _f32(df_h.avg_ccu),
+                     "name": "평균 CCU", "line": {"color": "#4fc3f7", "width": 2},
+                     "mode": "lines+markers", "fill": "tozeroy",
+                     "fillcolor": "rgba(79,195,247,0.15)"},
+                    {"type": "scatter", "x": x_h, "y": _f32(df_h.max_ccu),
+                     "name": "최대 CCU (최상위 게임)", "line": {"color": "#ff7043", "width": 1, "dash": "dot"},
+                     "mode": "lines"},
+                ]
+                h_layout.update(yaxis={"title": {"text": "CCU"}}, legend={"orientation": "h", "y": 1.12})
 
             elif metric_opt == "리뷰 점수":
-                fig_h = go.Figure(go.Scatter(
-                    x=df_h.period, y=df_h.avg_score,
-                    line=dict(color="#a5d6a7",width=2), mode="lines+markers",
-                    fill="tozeroy", fillcolor="rgba(165,214,167,0.1)"))
-                fig_h.update_layout(yaxis_title="평균 리뷰 점수", height=380,
-                                    plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+                h_traces = [{"type": "scatter", "x": x_h, "y": _f32(df_h.avg_score),
+                             "line": {"color": "#a5d6a7", "width": 2}, "mode": "lines+markers",
+                             "fill": "tozeroy", "fillcolor": "rgba(165,214,167,0.1)"}]
+                h_layout.update(yaxis={"title": {"text": "평균 리뷰 점수"}})
 
             elif metric_opt == "평균 플레이타임":
-                fig_h = go.Figure(go.Bar(
-                    x=df_h.period, y=df_h.avg_playtime,
-                    marker_color="rgba(255,183,77,0.85)"))
-                fig_h.update_layout(yaxis_title="평균 플레이타임 (시간)", height=380,
-                                    plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+                h_traces = [{"type": "bar", "x": x_h, "y": _f32(df_h.avg_playtime),
+                             "marker": {"color": "rgba(255,183,77,0.85)"}}]
+                h_layout.update(yaxis={"title": {"text": "평균 플레이타임 (시간)"}})
 
             elif metric_opt == "평균 가격":
-                fig_h = go.Figure(go.Scatter(
-                    x=df_h.period, y=df_h.avg_price,
-                    line=dict(color="#ce93d8",width=2), mode="lines+markers"))
-                fig_h.update_layout(yaxis_title="평균 가격 ($)", height=380,
-                                    plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+                h_traces = [{"type": "scatter", "x": x_h, "y": _f32(df_h.avg_price),
+                             "line": {"color": "#ce93d8", "width": 2}, "mode": "lines+markers"}]
+                h_layout.update(yaxis={"title": {"text": "평균 가격 ($)"}})
 
             else:  # 팔로워
-                fig_h = go.Figure(go.Scatter(
-                    x=df_h.period, y=df_h.avg_followers,
-                    line=dict(color="#80cbc4",width=2), mode="lines+markers",
-                    fill="tozeroy", fillcolor="rgba(128,203,196,0.15)"))
-                fig_h.update_layout(yaxis_title="평균 팔로워", height=380,
-                                    plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"))
+                h_traces = [{"type": "scatter", "x": x_h, "y": _f32(df_h.avg_followers),
+                             "line": {"color": "#80cbc4", "width": 2}, "mode": "lines+markers",
+                             "fill": "tozeroy", "fillcolor": "rgba(128,203,196,0.15)"}]
+                h_layout.update(yaxis={"title": {"text": "평균 팔로워"}})
+
+            fig_h = go.Figure(data=h_traces, layout=h_layout, _validate=False)
 
             st.plotly_chart(fig_h, width='stretch')
 
@@ -389,8 +398,16 @@ if show_history and "📅 시계열 히스토리" in tab_map:
             # 단일 게임 히스토리 (선택)
             st.divider()
             st.subheader("단일 게임 상세 히스토리")
-            game_names = [g.get("name","") for g in filtered]
-            sel_game_name = st.selectbox("게임 선택", sorted(game_names), key="single_game_hist")
+            # 선택 목록은 수익 상위 SG_NAME_LIMIT개 (검색어 입력 시 전체에서 검색) → 위젯 페이로드 제한
+            sg_query = st.text_input("게임 검색", key="single_game_query",
+                                     placeholder=f"비워두면 수익 상위 {SG_NAME_LIMIT}개 표시")
+            if sg_query:
+                q = sg_query.lower()
+                candidates = [g for g in filtered if q in g.get("name","").lower()]
+            else:
+                candidates = get_top_games(filtered, SG_NAME_LIMIT, "revenue")
+            game_names = heapq.nsmallest(SG_NAME_LIMIT, (g.get("name","") for g in candidates))
+            sel_game_name = st.selectbox("게임 선택", game_names, key="single_game_hist")
             sel_game = next((g for g in filtered if g.get("name") == sel_game_name), None)
             if sel_game:
                 sg_hist = get_history_for_game(sel_game, freq="monthly")
@@ -400,6 +417,8 @@ if show_history and "📅 시계열 히스토리" in tab_map:
                                              format_func=lambda x: {"sales_inc":"판매증분","revenue_inc":"수익증분",
                                                                      "ccu":"CCU","score":"점수","playtime":"플레이타임",
                                                                      "followers":"팔로워","wishlists":"위시리스트"}.get(x,x))
+                    if len(df_sg) > SG_MAX_POINTS:
+                        df_sg = df_sg.iloc[downsample_lttb(df_sg[sg_metric].to_numpy(), SG_MAX_POINTS)]
                     fig_sg = go.Figure(go.Scatter(
                         x=df_sg.period, y=df_sg[sg_metric],
                         line=dict(color="#4fc3f7",width=1.5), mode="lines"))
@@ -408,9 +427,13 @@ if show_history and "📅 시계열 히스토리" in tab_map:
                                          paper_bgcolor="#0e1117", font=dict(color="white"))
                     st.plotly_chart(fig_sg, width='stretch')
 
+    with tab_map["📅 시계열 히스토리"]:
+        _history_tab()
+
 # ── 탭: 국가별 분포 ───────────────────────────────────────
 if show_country and "🌍 국가별 분포" in tab_map:
-    with tab_map["🌍 국가별 분포"]:
+    @st.fragment
+    def _country_tab():
         st.subheader("국가별 플레이어 비율")
 
         weight_opt = st.radio("가중 기준", ["revenue","sales","equal"], horizontal=True,
@@ -421,15 +444,16 @@ if show_country and "🌍 국가별 분포" in tab_map:
         if not countries:
             st.info("국가별 데이터가 없습니다.")
         else:
-            names = list(countries.keys())[:20]
-            pcts  = [countries[n] for n in names]
+            top20 = list(islice(countries.items(), 20))
+            names = [n for n, _ in top20]
+            pcts  = [p for _, p in top20]
 
             col_bar, col_pie = st.columns(2)
             with col_bar:
                 fig_c1 = go.Figure(go.Bar(
-                    x=pcts[::-1], y=names[::-1], orientation="h",
+                    x=pcts, y=names, orientation="h",
                     marker_color="rgba(79,195,247,0.8)"))
-                fig_c1.update_layout(xaxis_title="비율 (%)", height=500,
+                fig_c1.update_layout(xaxis_title="비율 (%)", yaxis_autorange="reversed", height=500,
                                      plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
                                      font=dict(color="white"))
                 st.plotly_chart(fig_c1, width='stretch')
@@ -445,20 +469,24 @@ if show_country and "🌍 국가별 분포" in tab_map:
             # 국가별 데이터를 가진 게임 상세
             with st.expander("국가별 상세 데이터 (상위 20개 게임)"):
                 country_rows = []
-                for g in sorted(filtered, key=lambda x: x.get("revenue") or 0, reverse=True)[:20]:
+                for g in get_top_games(filtered, 20, "revenue"):
                     cd = _parse_field(g.get("countryData"), default={})
                     if not cd: continue
                     row = {"게임명": g.get("name","?")}
-                    top5 = sorted(cd.items(), key=lambda x: x[1], reverse=True)[:5]
+                    top5 = heapq.nlargest(5, cd.items(), key=lambda x: x[1])
                     for code, pct in top5:
                         row[code.upper()] = f"{pct}%"
                     country_rows.append(row)
                 if country_rows:
                     st.dataframe(pd.DataFrame(country_rows), use_container_width=True, hide_index=True)
 
+    with tab_map["🌍 국가별 분포"]:
+        _country_tab()
+
 # ── 탭: 유저 겹침 분석 ────────────────────────────────────
 if show_overlap and "🔗 유저 겹침" in tab_map:
-    with tab_map["🔗 유저 겹침"]:
+    @st.fragment
+    def _overlap_tab():
         st.subheader("유저 겹침 분석 (audienceOverlap)")
         st.caption(
             "선택 장르/태그 게임들과 유저를 공유하는 외부 게임. "
@@ -505,19 +533,18 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             st.markdown("#### 타겟 유저 맵 — Link × 유저 규모")
             st.caption("오른쪽 위(고Link + 대규모)일수록 핵심 타겟 유저 풀")
 
-            import math
             bubble_data = [o for o in overlaps if o["copies_sold"] > 0]
             if bubble_data:
-                max_reach = max(o["reach_score"] for o in bubble_data) or 1
+                reach = np.array([o["reach_score"] for o in bubble_data], dtype=np.float64)
                 fig_bubble = go.Figure(go.Scatter(
-                    x=[o["avg_link"] for o in bubble_data],
-                    y=[o["copies_sold"] / 1_000_000 for o in bubble_data],
+                    x=_f32([o["avg_link"] for o in bubble_data]),
+                    y=_f32([o["copies_sold"] / 1_000_000 for o in bubble_data]),
                     mode="markers+text",
                     text=[o["name"][:20] for o in bubble_data],
                     textposition="top center",
                     textfont=dict(size=9, color="rgba(255,255,255,0.7)"),
                     marker=dict(
-                        size=[max(8, min(50, o["reach_score"] / max_reach * 50)) for o in bubble_data],
+                        size=np.clip(reach / (reach.max() or 1) * 50, 8, 50),
                         color=[o["avg_link"] for o in bubble_data],
                         colorscale="YlOrRd",
                         showscale=True,
@@ -558,18 +585,20 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
                 st.plotly_chart(fig_bubble, width='stretch')
 
             # ── 바 차트: 추정 공유 유저 순 ──────────────────────
-            top15 = sorted(overlaps, key=lambda x: x["reach_score"], reverse=True)[:15]
+            # reach_score 정렬이면 이미 내림차순 → 앞 15개, 아니면 heap으로 상위 15개만 선택
+            top15 = (overlaps[:15] if ol_sort == "reach_score"
+                     else heapq.nlargest(15, overlaps, key=lambda x: x["reach_score"]))
             fig_bar = go.Figure(go.Bar(
-                x=[o["reach_score"] / 1_000_000 for o in top15][::-1],
-                y=[o["name"][:25] for o in top15][::-1],
+                x=_f32([o["reach_score"] / 1_000_000 for o in top15]),
+                y=[o["name"][:25] for o in top15],
                 orientation="h",
                 marker=dict(
-                    color=[o["avg_link"] for o in top15][::-1],
+                    color=[o["avg_link"] for o in top15],
                     colorscale="YlOrRd",
                     showscale=True,
                     colorbar=dict(title="Link"),
                 ),
-                customdata=[[f"{o['avg_link']:.3f}", f"{o['copies_sold']/1e6:.1f}M"] for o in top15][::-1],
+                customdata=[[f"{o['avg_link']:.3f}", f"{o['copies_sold']/1e6:.1f}M"] for o in top15],
                 hovertemplate=(
                     "<b>%{y}</b><br>추정 공유 유저: %{x:.2f}M<br>"
                     "Link: %{customdata[0]}<br>판매량: %{customdata[1]}<extra></extra>"
@@ -577,6 +606,7 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             ))
             fig_bar.update_layout(
                 xaxis_title="추정 공유 유저 (백만 명)",
+                yaxis_autorange="reversed",
                 height=440,
                 plot_bgcolor="#0e1117",
                 paper_bgcolor="#0e1117",
@@ -584,9 +614,13 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             )
             st.plotly_chart(fig_bar, width='stretch')
 
+    with tab_map["🔗 유저 겹침"]:
+        _overlap_tab()
+
 # ── 탭: 게임 목록 ─────────────────────────────────────────
 if show_game_table and "📋 게임 목록" in tab_map:
-    with tab_map["📋 게임 목록"]:
+    @st.fragment
+    def _game_table_tab():
         st.subheader(f"전체 게임 목록 ({len(filtered)}개)")
 
         sort_by = st.selectbox("정렬 기준", ["revenue","copiesSold","reviewScore","avgPlaytime","wishlists"],
@@ -594,28 +628,42 @@ if show_game_table and "📋 게임 목록" in tab_map:
                                                        "reviewScore":"리뷰점수",
                                                        "avgPlaytime":"플레이타임","wishlists":"위시리스트"}.get(x,x),
                                key="table_sort")
-        sorted_games = sorted(filtered, key=lambda x: x.get(sort_by) or 0, reverse=True)
-
-        rows = []
-        for g in sorted_games:
-            ts = g.get("releaseDate") or g.get("firstReleaseDate")
-            yr = datetime.fromtimestamp(int(ts)/1000).year if ts else "?"
-            rows.append({
-                "게임명": g.get("name","?"),
-                "출시": yr,
-                "장르": ", ".join((g.get("genres") or [])[:3]),
-                "가격($)": f"${g.get('price') or 0:.2f}",
-                "수익($M)": f"{(g.get('revenue') or 0)/1e6:.2f}",
-                "판매량(M)": f"{(g.get('copiesSold') or 0)/1e6:.2f}",
-                "리뷰점수": g.get("reviewScore") or 0,
-                "리뷰수": f"{(g.get('reviews') or 0):,.0f}",
-                "플레이타임(h)": f"{(g.get('avgPlaytime') or 0):.1f}".rstrip('0').rstrip('.'),
-                "팔로워": f"{(g.get('followers') or 0):,.0f}",
-                "위시리스트": f"{(g.get('wishlists') or 0):,.0f}",
-                "Steam 비율": f"{(g.get('steamPercent') or 0):.2f}",
-                "태그": ", ".join((g.get("tags") or [])[:5]),
-            })
-        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        # 컬럼 단위 구성: 수치는 그대로 두고 표시 형식은 column_config로 (행별 dict·문자열 포맷 생략)
+        num = get_numeric_columns(filtered, ["price", "revenue", "copiesSold", "reviewScore", "reviews",
+                                             "avgPlaytime", "followers", "wishlists", "steamPercent"])
+        order = np.argsort(-get_numeric_columns(filtered, [sort_by])[sort_by], kind="stable")
+        sorted_games = [filtered[i] for i in order.tolist()]
+        num = {k: v[order] for k, v in num.items()}
+        comma = "{:,.0f}".format
+
+        df_list = pd.DataFrame({
+            "게임명": [g.get("name","?") for g in sorted_games],
+            "출시": [_release_year(g) or "?" for g in sorted_games],
+            "장르": [", ".join((g.get("genres") or [])[:3]) for g in sorted_games],
+            "가격($)": num["price"],
+            "수익($M)": num["revenue"] / 1e6,
+            "판매량(M)": num["copiesSold"] / 1e6,
+            "리뷰점수": num["reviewScore"],
+            "리뷰수": pd.Series(num["reviews"]).map(comma),
+            "플레이타임(h)": num["avgPlaytime"],
+            "팔로워": pd.Series(num["followers"]).map(comma),
+            "위시리스트": pd.Series(num["wishlists"]).map(comma),
+            "Steam 비율": num["steamPercent"],
+            "태그": [", ".join((g.get("tags") or [])[:5]) for g in sorted_games],
+        })
+        st.dataframe(
+            df_list, use_container_width=True, hide_index=True,
+            column_config={
+                "가격($)": st.column_config.NumberColumn(format="$%.2f"),
+                "수익($M)": st.column_config.NumberColumn(format="%.2f"),
+                "판매량(M)": st.column_config.NumberColumn(format="%.2f"),
+                "플레이타임(h)": st.column_config.NumberColumn(format="%.1f"),
+                "Steam 비율": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+
+    with tab_map["📋 게임 목록"]:
+        _game_table_tab()
 
 # ── 탭: AI 분석 ───────────────────────────────────────────
 with tab_map["🤖 AI 분석"]:
@@ -627,14 +675,13 @@ with tab_map["🤖 AI 분석"]:
         st.error(f"Claude API 키 미설정: {msg}")
     else:
         if st.button("🔍 AI 분석 실행", type="primary"):
-            yearly = get_yearly_trends(filtered)
             if analysis_type == "태그":
                 stats = {k: v for k, v in get_tag_stats(filtered).items() if k in selected}
             else:
                 stats = {k: v for k, v in get_genre_stats(filtered).items() if k in selected}
 
             # 선택된 추가 데이터 포함
-            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25)
+            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25) if selected_metrics else ""
 
             prompt = build_genre_trend_prompt(
                 selected=selected,
@@ -642,14 +689,10 @@ with tab_map["🤖 AI 분석"]:
                 top_games=get_top_games(filtered, 25, "revenue"),
                 genre_stats=stats,
                 user_question=user_question,
+                extra_data=data_summary,
             )
-            # 추가 데이터 요약 삽입
-            if selected_metrics:
-                prompt = prompt.replace("## 분석 요청", f"## 추가 데이터\n{data_summary}\n\n## 분석 요청")
 
             placeholder = st.empty()
-            full_text = ""
             with st.spinner("Claude AI 분석 중..."):
-                for chunk in stream_analysis(prompt, SYSTEM_PROMPT):
-                    full_text += chunk
+                for full_text in accumulate_stream(stream_analysis(prompt, SYSTEM_PROMPT)):
                     placeholder.markdown(full_text)
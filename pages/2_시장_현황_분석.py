@@ -4,11 +4,11 @@
 import sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from datetime import datetime
+import heapq
+from itertools import islice
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -17,15 +17,19 @@ load_dotenv()
 st.set_page_config(page_title="시장 현황 분석", page_icon="🏪", layout="wide")
 
 from analysis.data_loader import (
-    load_all_games, filter_games, get_genre_stats,
+    load_all_games, filter_games, get_genre_stats, get_kpi_summary,
     get_monthly_releases, get_all_genres,
-    get_history_aggregate, get_country_aggregate,
-    get_activity_summary, get_audience_overlap_top,
-    summarize_full_for_claude, _parse_field,
+    get_history_aggregate_df, get_country_aggregate,
+    get_activity_summary, get_audience_overlap_top, get_playtime_distribution,
+    get_top_country, get_numeric_columns, get_top_games, get_histogram,
+    summarize_full_for_claude, _release_month,
 )
-from analysis.claude_client import stream_analysis, check_api_key
+from analysis.claude_client import stream_analysis, accumulate_stream, check_api_key
 from analysis.prompts import SYSTEM_PROMPT, build_market_overview_prompt
 
+# 리뷰 점수 vs 수익 산점도 최대 점 수 (초과 시 수익 상위만 표시)
+SCATTER_MAX_POINTS = 2000
+
 games      = load_all_games()
 all_genres = get_all_genres(games)
 
@@ -89,21 +93,27 @@ if not filtered:
     st.warning("조건에 맞는 게임이 없습니다.")
     st.stop()
 
+# 탭 공용 컬럼 (filtered 순서): 탭마다 게임 dict를 다시 순회하지 않도록 한 번만 구성
+num_cols = get_numeric_columns(filtered, ["price", "revenue", "copiesSold", "reviewScore",
+                                          "avgPlaytime", "followers", "wishlists"])
+game_names = np.array([g.get("name","") for g in filtered], dtype=object)
+
 # ── KPI 카드 ─────────────────────────────────────────────
-revenues  = [g.get("revenue") or 0 for g in filtered]
-sales_lst = [g.get("copiesSold") or 0 for g in filtered]
-scores    = [g.get("reviewScore") or 0 for g in filtered if g.get("reviewScore")]
-hit_cnt   = sum(1 for s in sales_lst if s >= 1_000_000)
+kpi = get_kpi_summary(filtered)
 
 c1,c2,c3,c4,c5 = st.columns(5)
-c1.metric("출시 게임 수",   f"{len(filtered):,}개")
-c2.metric("총 수익",        f"${sum(revenues)/1e9:.2f}B")
-c3.metric("평균 수익",      f"${sum(revenues)/len(revenues)/1e6:.2f}M")
-c4.metric("히트작(100만+)", f"{hit_cnt}개")
-c5.metric("평균 리뷰점수",  f"{sum(scores)/len(scores):.1f}" if scores else "-")
+c1.metric("출시 게임 수",   f"{kpi['game_count']:,}개")
+c2.metric("총 수익",        f"${kpi['total_revenue']/1e9:.2f}B")
+c3.metric("평균 수익",      f"${kpi['avg_revenue']/1e6:.2f}M")
+c4.metric("히트작(100만+)", f"{kpi['hit_count']}개")
+c5.metric("평균 리뷰점수",  f"{kpi['avg_score']:.1f}" if kpi["avg_score"] is not None else "-")
 
 st.divider()
 
+# 출시 추세 탭과 AI 프롬프트가 함께 쓰는 집계 (1회 계산)
+monthly     = get_monthly_releases(filtered)
+genre_stats = get_genre_stats(filtered)
+
 # ── 탭 구성 ──────────────────────────────────────────────
 tab_labels = (
     (["📅 출시 추세"]       if show_market   else []) +
@@ -121,10 +131,8 @@ tab_map = {l: t for l, t in zip(tab_labels, tabs)}
 if show_market and "📅 출시 추세" in tab_map:
     with tab_map["📅 출시 추세"]:
         st.subheader("월별 신규 출시 게임 수")
-        monthly = get_monthly_releases(filtered)
+        # filtered가 이미 출시 연도 범위로 걸러져 있어 월별 결과를 다시 거를 필요 없음
         df_m = pd.DataFrame(monthly)
-        if not df_m.empty:
-            df_m = df_m[df_m.month.str[:4].astype(int).between(year_min, year_max)]
         fig1 = go.Figure(go.Bar(x=df_m.month, y=df_m["count"],
                                 marker_color="rgba(79,195,247,0.8)"))
         fig1.update_layout(xaxis_title="출시 월", yaxis_title="게임 수",
@@ -133,7 +141,6 @@ if show_market and "📅 출시 추세" in tab_map:
         st.plotly_chart(fig1, width='stretch')
 
         col1, col2 = st.columns(2)
-        genre_stats = get_genre_stats(filtered)
 
         with col1:
             st.subheader("장르별 수익 비중")
@@ -148,9 +155,11 @@ if show_market and "📅 출시 추세" in tab_map:
 
         with col2:
             st.subheader("판매량 분포 (로그 스케일)")
-            log_sales = [np.log10(s) for s in sales_lst if s > 0]
-            fig3 = go.Figure(go.Histogram(x=log_sales, nbinsx=30,
-                                          marker_color="rgba(255,183,77,0.8)"))
+            sales = num_cols["copiesSold"]
+            log_sales = np.log10(sales[sales > 0])
+            centers, counts, width = get_histogram(log_sales, 30)
+            fig3 = go.Figure(go.Bar(x=centers, y=counts, width=width,
+                                    marker_color="rgba(255,183,77,0.8)"))
             fig3.update_layout(
                 xaxis=dict(title="판매량 (log10)",
                            tickvals=[6,6.5,7,7.5,8],
@@ -160,19 +169,27 @@ if show_market and "📅 출시 추세" in tab_map:
             st.plotly_chart(fig3, width='stretch')
 
         st.subheader("리뷰 점수 vs 수익")
-        rows = [{"name":g.get("name",""),"score":g.get("reviewScore") or 0,
-                 "rev_m":(g.get("revenue") or 0)/1e6,
-                 "sal_m":(g.get("copiesSold") or 0)/1e6}
-                for g in filtered if g.get("reviewScore")]
-        if rows:
-            df_sc = pd.DataFrame(rows)
+        import plotly.express as px  # 이 산점도에서만 사용 → 탭을 켰을 때만 로드
+        sc_idx = np.flatnonzero(num_cols["reviewScore"] != 0)
+        sc_total = len(sc_idx)
+        if sc_total > SCATTER_MAX_POINTS:
+            top = np.argpartition(-num_cols["revenue"][sc_idx], SCATTER_MAX_POINTS)[:SCATTER_MAX_POINTS]
+            sc_idx = np.sort(sc_idx[top])
+        if sc_total:
+            df_sc = pd.DataFrame({"name": game_names[sc_idx],
+                                  "score": num_cols["reviewScore"][sc_idx],
+                                  "rev_m": num_cols["revenue"][sc_idx] / 1e6,
+                                  "sal_m": num_cols["copiesSold"][sc_idx] / 1e6})
             fig4 = px.scatter(df_sc, x="score", y="rev_m", size="sal_m",
                               hover_name="name", color="score",
                               color_continuous_scale="Blues", size_max=40,
-                              labels={"score":"리뷰점수","rev_m":"수익(백만$)"})
+                              labels={"score":"리뷰점수","rev_m":"수익(백만$)"},
+                              render_mode="webgl")
             fig4.update_layout(height=380, plot_bgcolor="#0e1117",
                                paper_bgcolor="#0e1117", font=dict(color="white"))
             st.plotly_chart(fig4, width='stretch')
+            if sc_total > SCATTER_MAX_POINTS:
+                st.caption(f"수익 기준 상위 {SCATTER_MAX_POINTS:,}개 표시 (전체 {sc_total:,}개)")
 
 # ── 유저 활동 ─────────────────────────────────────────────
 if show_activity and "👥 유저 활동" in tab_map:
@@ -192,10 +209,11 @@ if show_activity and "👥 유저 활동" in tab_map:
 
         col1, col2 = st.columns(2)
         with col1:
-            pt_vals = [g.get("avgPlaytime") or 0 for g in filtered if (g.get("avgPlaytime") or 0) > 0]
-            if pt_vals:
-                fig_pt = go.Figure(go.Histogram(
-                    x=[v for v in pt_vals if v < 200], nbinsx=25,
+            pt_vals = num_cols["avgPlaytime"]
+            if (pt_vals > 0).any():
+                centers, counts, width = get_histogram(pt_vals[(pt_vals > 0) & (pt_vals < 200)], 25, (0, 200))
+                fig_pt = go.Figure(go.Bar(
+                    x=centers, y=counts, width=width,
                     marker_color="rgba(255,183,77,0.8)"))
                 fig_pt.update_layout(xaxis_title="평균 플레이타임 (h)", yaxis_title="게임 수",
                     height=300, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"),
@@ -204,29 +222,22 @@ if show_activity and "👥 유저 활동" in tab_map:
 
         with col2:
             # 팔로워 상위 10
-            top10_fol = sorted(filtered, key=lambda x: x.get("followers") or 0, reverse=True)[:10]
+            top10_fol = get_top_games(filtered, 10, "followers")
             fig_fol2 = go.Figure(go.Bar(
-                x=[(g.get("followers") or 0)/1000 for g in top10_fol][::-1],
-                y=[g.get("name","")[:25] for g in top10_fol][::-1],
+                x=[(g.get("followers") or 0)/1000 for g in top10_fol],
+                y=[g.get("name","")[:25] for g in top10_fol],
                 orientation="h", marker_color="rgba(79,195,247,0.8)"))
-            fig_fol2.update_layout(xaxis_title="팔로워 (천)", height=300,
+            fig_fol2.update_layout(xaxis_title="팔로워 (천)", yaxis_autorange="reversed", height=300,
                 plot_bgcolor="#0e1117", paper_bgcolor="#0e1117", font=dict(color="white"),
                 title="팔로워 상위 10개 게임")
             st.plotly_chart(fig_fol2, width='stretch')
 
         # 플레이타임 구간
-        bucket_sums = {}
-        cnt = 0
-        for g in filtered:
-            dist = (_parse_field(g.get("playtimeData"), default={}) or {}).get("distribution") or {}
-            if dist:
-                for b, pct in dist.items():
-                    bucket_sums[b] = bucket_sums.get(b, 0) + pct
-                cnt += 1
-        if bucket_sums and cnt:
+        pt_dist = get_playtime_distribution(filtered)
+        if pt_dist:
             order = ["0-1h","1-2h","2-5h","5-10h","10-20h","20-50h","50-100h","100-500h","500-1000h"]
-            bkts = [b for b in order if b in bucket_sums]
-            avgs = [round(bucket_sums[b]/cnt,1) for b in bkts]
+            bkts = [b for b in order if b in pt_dist]
+            avgs = [round(pt_dist[b], 1) for b in bkts]
             fig_bd = go.Figure(go.Bar(x=bkts, y=avgs, marker_color="rgba(206,147,216,0.85)"))
             fig_bd.update_layout(xaxis_title="플레이타임 구간", yaxis_title="평균 비율 (%)",
                 height=260, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
@@ -238,12 +249,11 @@ if show_history and "📈 시계열 히스토리" in tab_map:
     with tab_map["📈 시계열 히스토리"]:
         st.subheader("기간 내 게임들의 시계열 집계 트렌드")
 
-        hist_data = get_history_aggregate(filtered, freq="yearly",
-                                          year_min=year_min, year_max=year_max)
-        if not hist_data:
+        df_h = get_history_aggregate_df(filtered, freq="yearly",
+                                        year_min=year_min, year_max=year_max)
+        if df_h.empty:
             st.info("히스토리 데이터가 없습니다.")
         else:
-            df_h = pd.DataFrame([{"period": p, **v} for p, v in hist_data.items()])
 
             metric_tabs = st.tabs(["수익·판매", "동시접속(히스토리)", "점수·플레이타임", "가격·팔로워"])
 
@@ -302,19 +312,22 @@ if show_history and "📈 시계열 히스토리" in tab_map:
 
 # ── 국가별 분포 ───────────────────────────────────────────
 if show_country and "🌍 국가별 분포" in tab_map:
-    with tab_map["🌍 국가별 분포"]:
+    @st.fragment
+    def _country_tab():
         st.subheader("국가별 플레이어 비율")
         weight_opt = st.radio("가중 기준", ["revenue","sales","equal"], horizontal=True,
                               format_func=lambda x: {"revenue":"수익가중","sales":"판매가중","equal":"동일가중"}.get(x,x))
         countries = get_country_aggregate(filtered, weight_by=weight_opt)
         if countries:
-            names = list(countries.keys())[:20]
-            pcts  = [countries[n] for n in names]
+            # get_country_aggregate는 비율 내림차순 정렬 dict → 앞 20개만 한 번에 꺼냄
+            top20 = list(islice(countries.items(), 20))
+            names = [n for n, _ in top20]
+            pcts  = [p for _, p in top20]
             col1, col2 = st.columns(2)
             with col1:
-                fig_c = go.Figure(go.Bar(x=pcts[::-1], y=names[::-1],
+                fig_c = go.Figure(go.Bar(x=pcts, y=names,
                                          orientation="h", marker_color="rgba(79,195,247,0.8)"))
-                fig_c.update_layout(xaxis_title="비율 (%)", height=500,
+                fig_c.update_layout(xaxis_title="비율 (%)", yaxis_autorange="reversed", height=500,
                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
                                     font=dict(color="white"))
                 st.plotly_chart(fig_c, width='stretch')
@@ -325,9 +338,13 @@ if show_country and "🌍 국가별 분포" in tab_map:
                                     font=dict(color="white"), showlegend=False)
                 st.plotly_chart(fig_p, width='stretch')
 
+    with tab_map["🌍 국가별 분포"]:
+        _country_tab()
+
 # ── 유저 겹침 ─────────────────────────────────────────────
 if show_overlap and "🔗 유저 겹침" in tab_map:
-    with tab_map["🔗 유저 겹침"]:
+    @st.fragment
+    def _overlap_tab():
         st.subheader("유저 겹침 분석 (audienceOverlap)")
         st.caption(
             "해당 기간 출시 게임들과 유저를 공유하는 외부 게임. "
@@ -368,10 +385,9 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             st.markdown("#### 타겟 유저 맵 — Link × 유저 규모")
             st.caption("오른쪽 위(고Link + 대규모)일수록 핵심 타겟 유저 풀")
 
-            import math
             bubble_data = [o for o in overlaps if o["copies_sold"] > 0]
             if bubble_data:
-                max_reach = max(o["reach_score"] for o in bubble_data) or 1
+                reach = np.array([o["reach_score"] for o in bubble_data], dtype=np.float64)
                 fig_bubble = go.Figure(go.Scatter(
                     x=[o["avg_link"] for o in bubble_data],
                     y=[o["copies_sold"] / 1_000_000 for o in bubble_data],
@@ -380,7 +396,7 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
                     textposition="top center",
                     textfont=dict(size=9, color="rgba(255,255,255,0.7)"),
                     marker=dict(
-                        size=[max(8, min(50, o["reach_score"] / max_reach * 50)) for o in bubble_data],
+                        size=np.clip(reach / (reach.max() or 1) * 50, 8, 50),
                         color=[o["avg_link"] for o in bubble_data],
                         colorscale="YlOrRd",
                         showscale=True,
@@ -414,18 +430,20 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
                 st.plotly_chart(fig_bubble, width='stretch')
 
             # ── 바 차트: 추정 공유 유저 순 ──────────────────────
-            top15 = sorted(overlaps, key=lambda x: x["reach_score"], reverse=True)[:15]
+            # reach_score 정렬이면 이미 내림차순 → 앞 15개, 아니면 heap으로 상위 15개만 선택
+            top15 = (overlaps[:15] if ol_sort == "reach_score"
+                     else heapq.nlargest(15, overlaps, key=lambda x: x["reach_score"]))
             fig_bar = go.Figure(go.Bar(
-                x=[o["reach_score"] / 1_000_000 for o in top15][::-1],
-                y=[o["name"][:25] for o in top15][::-1],
+                x=[o["reach_score"] / 1_000_000 for o in top15],
+                y=[o["name"][:25] for o in top15],
                 orientation="h",
                 marker=dict(
-                    color=[o["avg_link"] for o in top15][::-1],
+                    color=[o["avg_link"] for o in top15],
                     colorscale="YlOrRd",
                     showscale=True,
                     colorbar=dict(title="Link"),
                 ),
-                customdata=[[f"{o['avg_link']:.3f}", f"{o['copies_sold']/1e6:.1f}M"] for o in top15][::-1],
+                customdata=[[f"{o['avg_link']:.3f}", f"{o['copies_sold']/1e6:.1f}M"] for o in top15],
                 hovertemplate=(
                     "<b>%{y}</b><br>추정 공유 유저: %{x:.2f}M<br>"
                     "Link: %{customdata[0]}<br>판매량: %{customdata[1]}<extra></extra>"
@@ -433,6 +451,7 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             ))
             fig_bar.update_layout(
                 xaxis_title="추정 공유 유저 (백만 명)",
+                yaxis_autorange="reversed",
                 height=440,
                 plot_bgcolor="#0e1117",
                 paper_bgcolor="#0e1117",
@@ -440,31 +459,49 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             )
             st.plotly_chart(fig_bar, width='stretch')
 
+    with tab_map["🔗 유저 겹침"]:
+        _overlap_tab()
+
 # ── 게임 목록 ─────────────────────────────────────────────
 if show_table and "📋 게임 목록" in tab_map:
-    with tab_map["📋 게임 목록"]:
+    @st.fragment
+    def _game_table_tab():
         st.subheader(f"전체 게임 목록 ({len(filtered)}개)")
         sort_by = st.selectbox("정렬 기준",
             ["revenue","copiesSold","reviewScore","avgPlaytime","wishlists"],
             format_func=lambda x: {"revenue":"수익","copiesSold":"판매량","reviewScore":"리뷰점수",
                                    "avgPlaytime":"플레이타임","wishlists":"위시리스트"}.get(x,x))
-        rows = []
-        for g in sorted(filtered, key=lambda x: x.get(sort_by) or 0, reverse=True):
-            ts = g.get("releaseDate") or g.get("firstReleaseDate")
-            yr = datetime.fromtimestamp(int(ts)/1000).strftime("%Y-%m") if ts else "?"
-            rows.append({"게임명":g.get("name",""),"출시":yr,
-                         "장르":", ".join((g.get("genres") or [])[:3]),
-                         "가격($)":f"${g.get('price') or 0:.2f}",
-                         "수익($M)":f"{(g.get('revenue') or 0)/1e6:.2f}",
-                         "판매량(M)":f"{(g.get('copiesSold') or 0)/1e6:.2f}",
-                         "리뷰점수":g.get("reviewScore") or 0,
-                         "플레이타임(h)":f"{(g.get('avgPlaytime') or 0):.1f}".rstrip('0').rstrip('.'),
-                         "팔로워":f"{(g.get('followers') or 0):,.0f}",
-                         "위시리스트":f"{(g.get('wishlists') or 0):,.0f}",
-                         "국가Top1": sorted((_parse_field(g.get("countryData"), default={}) or {}).items(),
-                                           key=lambda x:x[1],reverse=True)[0][0].upper()
-                                     if _parse_field(g.get("countryData"), default={}) else "-"})
-        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        # 컬럼 단위 구성: 수치는 그대로 두고 표시 형식은 column_config로 (행별 dict·문자열 포맷 생략)
+        order = np.argsort(-num_cols[sort_by], kind="stable")
+        sorted_games = [filtered[i] for i in order.tolist()]
+        num = {k: v[order] for k, v in num_cols.items()}
+        comma = "{:,.0f}".format
+
+        df_list = pd.DataFrame({
+            "게임명": [g.get("name","") for g in sorted_games],
+            "출시": [_release_month(g) or "?" for g in sorted_games],
+            "장르": [", ".join((g.get("genres") or [])[:3]) for g in sorted_games],
+            "가격($)": num["price"],
+            "수익($M)": num["revenue"] / 1e6,
+            "판매량(M)": num["copiesSold"] / 1e6,
+            "리뷰점수": num["reviewScore"],
+            "플레이타임(h)": num["avgPlaytime"],
+            "팔로워": pd.Series(num["followers"]).map(comma),
+            "위시리스트": pd.Series(num["wishlists"]).map(comma),
+            "국가Top1": [c or "-" for c in get_top_country(sorted_games)],
+        })
+        st.dataframe(
+            df_list, use_container_width=True, hide_index=True,
+            column_config={
+                "가격($)": st.column_config.NumberColumn(format="$%.2f"),
+                "수익($M)": st.column_config.NumberColumn(format="%.2f"),
+                "판매량(M)": st.column_config.NumberColumn(format="%.2f"),
+                "플레이타임(h)": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
+
+    with tab_map["📋 게임 목록"]:
+        _game_table_tab()
 
 # ── AI 분석 ───────────────────────────────────────────────
 with tab_map["🤖 AI 분석"]:
@@ -474,20 +511,17 @@ with tab_map["🤖 AI 분석"]:
         st.error(f"Claude API 키 미설정: {msg}")
     else:
         if st.button("🔍 AI 시장 분석 실행", type="primary"):
-            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25)
+            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25) if selected_metrics else ""
             prompt = build_market_overview_prompt(
                 period_label=period_label,
                 games=filtered,
-                monthly_data=get_monthly_releases(filtered),
-                genre_dist=get_genre_stats(filtered),
+                monthly_data=monthly,
+                genre_dist=genre_stats,
                 user_question=user_question,
+                extra_data=data_summary,
             )
-            if selected_metrics:
-                prompt = prompt.replace("## 분석 요청", f"## 추가 데이터\n{data_summary}\n\n## 분석 요청")
 
             placeholder = st.empty()
-            full_text = ""
             with st.spinner("Claude AI 분석 중..."):
-                for chunk in stream_analysis(prompt, SYSTEM_PROMPT):
-                    full_text += chunk
+                for full_text in accumulate_stream(stream_analysis(prompt, SYSTEM_PROMPT)):
                     placeholder.markdown(full_text)
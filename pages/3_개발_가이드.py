@@ -4,7 +4,8 @@
 import sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from datetime import datetime
+import numpy as np
+from itertools import islice
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
@@ -16,16 +17,30 @@ load_dotenv()
 st.set_page_config(page_title="개발 전략 가이드", page_icon="🛠", layout="wide")
 
 from analysis.data_loader import (
-    load_all_games, filter_games, get_top_games,
+    load_all_games, filter_games, get_top_games, get_kpi_summary,
     get_common_tags, get_price_buckets,
     get_all_tags, get_all_genres,
-    get_history_aggregate, get_country_aggregate,
-    get_activity_summary, get_audience_overlap_top,
-    summarize_full_for_claude, _parse_field,
+    get_history_aggregate_df, get_country_aggregate,
+    get_activity_summary, get_audience_overlap_top, get_playtime_distribution,
+    get_numeric_columns, get_histogram, summarize_full_for_claude, _release_year,
+)
+from analysis.claude_client import (
+    stream_analysis, accumulate_stream, submit_batch, get_batch_result, check_api_key,
 )
-from analysis.claude_client import stream_analysis, check_api_key
 from analysis.prompts import SYSTEM_PROMPT, build_dev_guide_prompt
 
+SCATTER_MAX_POINTS = 2000
+
+
+def _scatter_points(mask: np.ndarray, weight: np.ndarray) -> tuple[np.ndarray, int]:
+    """mask 대상 인덱스 (원래 순서) — SCATTER_MAX_POINTS 초과 시 weight 상위만 남김. (인덱스, 전체 수)"""
+    idx = np.flatnonzero(mask)
+    total = len(idx)
+    if total > SCATTER_MAX_POINTS:
+        top = np.argpartition(-weight[idx], SCATTER_MAX_POINTS)[:SCATTER_MAX_POINTS]
+        idx = np.sort(idx[top])
+    return idx, total
+
 games      = load_all_games()
 all_tags   = get_all_tags(games, min_count=5)
 all_genres = get_all_genres(games)
@@ -95,19 +110,26 @@ if not filtered:
     st.warning("조건에 맞는 게임이 없습니다.")
     st.stop()
 
+# 탭 공용 컬럼 (filtered 순서): 산점도·분포마다 게임 dict를 다시 순회하지 않도록 한 번만 구성
+num_cols = get_numeric_columns(filtered, ["revenue", "copiesSold", "reviewScore", "avgPlaytime", "followers"])
+game_names = np.array([g.get("name","") for g in filtered], dtype=object)
+
+# 필터가 그대로인 재실행 (추가 질문 입력·AI 버튼 등)에서는 이전에 만든 Figure 재사용
+fig_sig = (analysis_type, tuple(selected), scale, year_min, year_max)
+if st.session_state.get("guide_fig_sig") != fig_sig:
+    st.session_state["guide_fig_sig"] = fig_sig
+    st.session_state["guide_figs"] = {}
+figs = st.session_state["guide_figs"]
+
 # ── KPI 카드 ─────────────────────────────────────────────
-revenues   = [g.get("revenue") or 0 for g in filtered]
-sales_lst  = [g.get("copiesSold") or 0 for g in filtered]
-scores     = [g.get("reviewScore") or 0 for g in filtered if g.get("reviewScore")]
-playtimes  = [g.get("avgPlaytime") or 0 for g in filtered if g.get("avgPlaytime")]
-followers_ = [g.get("followers") or 0 for g in filtered if g.get("followers")]
+kpi = get_kpi_summary(filtered)
 
 c1,c2,c3,c4,c5 = st.columns(5)
-c1.metric("분석 게임 수",   f"{len(filtered):,}개")
-c2.metric("평균 수익",      f"${sum(revenues)/len(revenues)/1e6:.2f}M")
-c3.metric("평균 판매량",    f"{sum(sales_lst)/len(sales_lst)/1e6:.2f}M장")
-c4.metric("평균 리뷰 점수", f"{sum(scores)/len(scores):.1f}" if scores else "-")
-c5.metric("평균 팔로워",    f"{sum(followers_)/len(followers_):,.0f}" if followers_ else "-")
+c1.metric("분석 게임 수",   f"{kpi['game_count']:,}개")
+c2.metric("평균 수익",      f"${kpi['avg_revenue']/1e6:.2f}M")
+c3.metric("평균 판매량",    f"{kpi['avg_sales']/1e6:.2f}M장")
+c4.metric("평균 리뷰 점수", f"{kpi['avg_score']:.1f}" if kpi["avg_score"] is not None else "-")
+c5.metric("평균 팔로워",    f"{kpi['avg_followers']:,.0f}" if kpi["avg_followers"] is not None else "-")
 
 st.divider()
 
@@ -128,20 +150,32 @@ with tab_map["🏆 벤치마크"]:
     st.subheader(f"벤치마크 성공작 Top {top_n}")
     top_games = get_top_games(filtered, top_n, "revenue")
 
-    rows = []
-    for i, g in enumerate(top_games, 1):
-        ts = g.get("releaseDate") or g.get("firstReleaseDate")
-        yr = datetime.fromtimestamp(int(ts)/1000).year if ts else "?"
-        rows.append({"#":i,"게임명":g.get("name",""),"출시":yr,
-                     "가격($)":f"${g.get('price') or 0:.2f}",
-                     "수익($M)":f"{(g.get('revenue') or 0)/1e6:.2f}",
-                     "판매량(M)":f"{(g.get('copiesSold') or 0)/1e6:.2f}",
-                     "리뷰점수":g.get("reviewScore") or 0,
-                     "플레이타임(h)":f"{(g.get('avgPlaytime') or 0):.1f}".rstrip('0').rstrip('.'),
-                     "팔로워":f"{(g.get('followers') or 0):,.0f}",
-                     "위시리스트":f"{(g.get('wishlists') or 0):,.0f}",
-                     "태그":", ".join((g.get("tags") or [])[:4])})
-    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    # 컬럼 단위 구성: 수치는 그대로 두고 표시 형식은 column_config로
+    num = get_numeric_columns(top_games, ["price", "revenue", "copiesSold", "reviewScore",
+                                          "avgPlaytime", "followers", "wishlists"])
+    comma = "{:,.0f}".format
+    df_top = pd.DataFrame({
+        "#": np.arange(1, len(top_games) + 1),
+        "게임명": [g.get("name","") for g in top_games],
+        "출시": [_release_year(g) or "?" for g in top_games],
+        "가격($)": num["price"],
+        "수익($M)": num["revenue"] / 1e6,
+        "판매량(M)": num["copiesSold"] / 1e6,
+        "리뷰점수": num["reviewScore"],
+        "플레이타임(h)": num["avgPlaytime"],
+        "팔로워": pd.Series(num["followers"]).map(comma),
+        "위시리스트": pd.Series(num["wishlists"]).map(comma),
+        "태그": [", ".join((g.get("tags") or [])[:4]) for g in top_games],
+    })
+    st.dataframe(
+        df_top, use_container_width=True, hide_index=True,
+        column_config={
+            "가격($)": st.column_config.NumberColumn(format="$%.2f"),
+            "수익($M)": st.column_config.NumberColumn(format="%.2f"),
+            "판매량(M)": st.column_config.NumberColumn(format="%.2f"),
+            "플레이타임(h)": st.column_config.NumberColumn(format="%.1f"),
+        },
+    )
 
     st.divider()
     col1, col2 = st.columns(2)
@@ -149,40 +183,50 @@ with tab_map["🏆 벤치마크"]:
     with col1:
         st.subheader("💰 가격대별 수익 분포")
         price_data = get_price_buckets(filtered)
-        df_p = pd.DataFrame(price_data)
-        order = ["무료","$0~5","$5~10","$10~20","$20~30","$30~60","$60+"]
-        df_p["price_bucket"] = pd.Categorical(df_p["price_bucket"], categories=order, ordered=True)
-        df_p = df_p.sort_values("price_bucket")
-        fig_box = px.box(df_p, x="price_bucket", y="revenue", color="price_bucket",
-                         log_y=True, labels={"price_bucket":"가격대","revenue":"수익($)"})
-        fig_box.update_layout(showlegend=False, height=380,
-                              plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                              font=dict(color="white"))
+        fig_box = figs.get("price_box")
+        if fig_box is None:
+            df_p = pd.DataFrame(price_data)
+            order = ["무료","$0~5","$5~10","$10~20","$20~30","$30~60","$60+"]
+            df_p["price_bucket"] = pd.Categorical(df_p["price_bucket"], categories=order, ordered=True)
+            df_p = df_p.sort_values("price_bucket")
+            fig_box = px.box(df_p, x="price_bucket", y="revenue", color="price_bucket",
+                             log_y=True, labels={"price_bucket":"가격대","revenue":"수익($)"})
+            fig_box.update_layout(showlegend=False, height=380,
+                                  plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                  font=dict(color="white"))
+            figs["price_box"] = fig_box
         st.plotly_chart(fig_box, width='stretch')
 
     with col2:
         st.subheader("🏷 성공작 공통 태그 Top 15")
         common_tags = get_common_tags(filtered, 15)
         if common_tags:
-            tag_names = [t for t,_ in common_tags]
-            tag_cnts  = [c for _,c in common_tags]
-            fig_tags = go.Figure(go.Bar(
-                x=tag_cnts[::-1], y=tag_names[::-1],
-                orientation="h", marker_color="rgba(129,199,132,0.85)"))
-            fig_tags.update_layout(xaxis_title="게임 수", height=380,
-                                   plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                   font=dict(color="white"))
+            fig_tags = figs.get("common_tags")
+            if fig_tags is None:
+                tag_names = [t for t,_ in common_tags]
+                tag_cnts  = [c for _,c in common_tags]
+                fig_tags = go.Figure(go.Bar(
+                    x=tag_cnts, y=tag_names,
+                    orientation="h", marker_color="rgba(129,199,132,0.85)"))
+                fig_tags.update_layout(xaxis_title="게임 수", yaxis_autorange="reversed", height=380,
+                                       plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                       font=dict(color="white"))
+                figs["common_tags"] = fig_tags
             st.plotly_chart(fig_tags, width='stretch')
 
     st.subheader("⏱ 평균 플레이타임 분포")
-    pt_vals = [g.get("avgPlaytime") or 0 for g in filtered if (g.get("avgPlaytime") or 0) > 0]
-    if pt_vals:
-        fig_pt = go.Figure(go.Histogram(
-            x=[v for v in pt_vals if v < 200], nbinsx=25,
-            marker_color="rgba(255,138,101,0.8)"))
-        fig_pt.update_layout(xaxis_title="평균 플레이타임 (h)", yaxis_title="게임 수",
-                             height=280, plot_bgcolor="#0e1117",
-                             paper_bgcolor="#0e1117", font=dict(color="white"))
+    pt_vals = num_cols["avgPlaytime"]
+    if (pt_vals > 0).any():
+        fig_pt = figs.get("playtime_hist")
+        if fig_pt is None:
+            centers, counts, width = get_histogram(pt_vals[(pt_vals > 0) & (pt_vals < 200)], 25, (0, 200))
+            fig_pt = go.Figure(go.Bar(
+                x=centers, y=counts, width=width,
+                marker_color="rgba(255,138,101,0.8)"))
+            fig_pt.update_layout(xaxis_title="평균 플레이타임 (h)", yaxis_title="게임 수",
+                                 height=280, plot_bgcolor="#0e1117",
+                                 paper_bgcolor="#0e1117", font=dict(color="white"))
+            figs["playtime_hist"] = fig_pt
         st.plotly_chart(fig_pt, width='stretch')
 
 # ── 유저 활동 ─────────────────────────────────────────────
@@ -205,129 +249,147 @@ if show_activity and "👥 유저 활동" in tab_map:
 
         with col1:
             # 팔로워 vs 판매량
-            rows = [{"name":g.get("name",""),
-                     "fol_k":(g.get("followers") or 0)/1000,
-                     "sales_m":(g.get("copiesSold") or 0)/1e6,
-                     "score":g.get("reviewScore") or 0}
-                    for g in filtered if g.get("followers")]
-            if rows:
-                df_cs = pd.DataFrame(rows)
-                fig_cs = px.scatter(df_cs, x="fol_k", y="sales_m", color="score",
-                                    hover_name="name", color_continuous_scale="Viridis",
-                                    labels={"fol_k":"팔로워(천)","sales_m":"판매량(백만장)","score":"점수"},
-                                    size_max=12)
-                fig_cs.update_layout(title="팔로워 vs 판매량", height=320,
-                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                     font=dict(color="white"))
+            cs_idx, cs_total = _scatter_points(num_cols["followers"] != 0, num_cols["copiesSold"])
+            if cs_total:
+                fig_cs = figs.get("followers_sales")
+                if fig_cs is None:
+                    df_cs = pd.DataFrame({"name": game_names[cs_idx],
+                                          "fol_k": num_cols["followers"][cs_idx] / 1000,
+                                          "sales_m": num_cols["copiesSold"][cs_idx] / 1e6,
+                                          "score": num_cols["reviewScore"][cs_idx]})
+                    fig_cs = px.scatter(df_cs, x="fol_k", y="sales_m", color="score",
+                                        hover_name="name", color_continuous_scale="Viridis",
+                                        labels={"fol_k":"팔로워(천)","sales_m":"판매량(백만장)","score":"점수"},
+                                        size_max=12, render_mode="webgl")
+                    fig_cs.update_layout(title="팔로워 vs 판매량", height=320,
+                                         plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                         font=dict(color="white"))
+                    figs["followers_sales"] = fig_cs
                 st.plotly_chart(fig_cs, width='stretch')
+                if cs_total > SCATTER_MAX_POINTS:
+                    st.caption(f"판매량 기준 상위 {SCATTER_MAX_POINTS:,}개 표시 (전체 {cs_total:,}개)")
 
         with col2:
             # 플레이타임 vs 리뷰점수
-            rows2 = [{"name":g.get("name",""),
-                      "pt":g.get("avgPlaytime") or 0,
-                      "score":g.get("reviewScore") or 0,
-                      "rev_m":(g.get("revenue") or 0)/1e6}
-                     for g in filtered if g.get("reviewScore") and (g.get("avgPlaytime") or 0) < 200]
-            if rows2:
-                df_ps = pd.DataFrame(rows2)
-                fig_ps = px.scatter(df_ps, x="pt", y="score", color="rev_m",
-                                    hover_name="name", color_continuous_scale="Blues",
-                                    labels={"pt":"플레이타임(h)","score":"리뷰점수","rev_m":"수익(백만$)"},
-                                    size_max=12)
-                fig_ps.update_layout(title="플레이타임 vs 리뷰점수", height=320,
-                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                     font=dict(color="white"))
+            ps_idx, ps_total = _scatter_points(
+                (num_cols["reviewScore"] != 0) & (num_cols["avgPlaytime"] < 200), num_cols["revenue"])
+            if ps_total:
+                fig_ps = figs.get("playtime_score")
+                if fig_ps is None:
+                    df_ps = pd.DataFrame({"name": game_names[ps_idx],
+                                          "pt": num_cols["avgPlaytime"][ps_idx],
+                                          "score": num_cols["reviewScore"][ps_idx],
+                                          "rev_m": num_cols["revenue"][ps_idx] / 1e6})
+                    fig_ps = px.scatter(df_ps, x="pt", y="score", color="rev_m",
+                                        hover_name="name", color_continuous_scale="Blues",
+                                        labels={"pt":"플레이타임(h)","score":"리뷰점수","rev_m":"수익(백만$)"},
+                                        size_max=12, render_mode="webgl")
+                    fig_ps.update_layout(title="플레이타임 vs 리뷰점수", height=320,
+                                         plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                         font=dict(color="white"))
+                    figs["playtime_score"] = fig_ps
                 st.plotly_chart(fig_ps, width='stretch')
+                if ps_total > SCATTER_MAX_POINTS:
+                    st.caption(f"수익 기준 상위 {SCATTER_MAX_POINTS:,}개 표시 (전체 {ps_total:,}개)")
 
         # 플레이타임 구간 분포
-        bucket_sums = {}
-        cnt = 0
-        for g in filtered:
-            dist = (_parse_field(g.get("playtimeData"), default={}) or {}).get("distribution") or {}
-            if dist:
-                for b, pct in dist.items():
-                    bucket_sums[b] = bucket_sums.get(b, 0) + pct
-                cnt += 1
-        if bucket_sums and cnt:
-            order = ["0-1h","1-2h","2-5h","5-10h","10-20h","20-50h","50-100h","100-500h","500-1000h"]
-            bkts = [b for b in order if b in bucket_sums]
-            avgs = [round(bucket_sums[b]/cnt,1) for b in bkts]
-            fig_bd = go.Figure(go.Bar(x=bkts, y=avgs, marker_color="rgba(206,147,216,0.85)"))
-            fig_bd.update_layout(xaxis_title="플레이타임 구간", yaxis_title="평균 비율(%)",
-                height=260, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                font=dict(color="white"), title="성공작의 플레이타임 구간별 유저 비율")
+        pt_dist = get_playtime_distribution(filtered)
+        if pt_dist:
+            fig_bd = figs.get("playtime_buckets")
+            if fig_bd is None:
+                order = ["0-1h","1-2h","2-5h","5-10h","10-20h","20-50h","50-100h","100-500h","500-1000h"]
+                bkts = [b for b in order if b in pt_dist]
+                avgs = [round(pt_dist[b], 1) for b in bkts]
+                fig_bd = go.Figure(go.Bar(x=bkts, y=avgs, marker_color="rgba(206,147,216,0.85)"))
+                fig_bd.update_layout(xaxis_title="플레이타임 구간", yaxis_title="평균 비율(%)",
+                    height=260, plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                    font=dict(color="white"), title="성공작의 플레이타임 구간별 유저 비율")
+                figs["playtime_buckets"] = fig_bd
             st.plotly_chart(fig_bd, width='stretch')
 
 # ── 시계열 히스토리 ───────────────────────────────────────
 if show_history and "📈 시계열 히스토리" in tab_map:
     with tab_map["📈 시계열 히스토리"]:
         st.subheader("장르·태그 시계열 성장 추이")
-        hist_data = get_history_aggregate(filtered, freq="yearly")
-        if not hist_data:
+        df_h = get_history_aggregate_df(filtered, freq="yearly")
+        if df_h.empty:
             st.info("히스토리 데이터가 없습니다.")
         else:
-            df_h = pd.DataFrame([{"period":p,**v} for p,v in hist_data.items()])
             col1, col2 = st.columns(2)
             with col1:
-                fig_rev = go.Figure()
-                fig_rev.add_trace(go.Bar(x=df_h.period, y=df_h.revenue_inc/1e6,
-                                         name="수익증분(백만$)", marker_color="rgba(79,195,247,0.8)"))
-                fig_rev.add_trace(go.Scatter(x=df_h.period, y=df_h.sales_inc/1e6,
-                                             name="판매증분(백만장)", yaxis="y2",
-                                             line=dict(color="#ff7043",width=2)))
-                fig_rev.update_layout(yaxis=dict(title="수익(백만$)"),
-                                      yaxis2=dict(title="판매(백만장)",overlaying="y",side="right"),
-                                      height=340, plot_bgcolor="#0e1117",
-                                      paper_bgcolor="#0e1117", font=dict(color="white"),
-                                      title="연도별 수익·판매 증분")
+                fig_rev = figs.get("history_revenue")
+                if fig_rev is None:
+                    fig_rev = go.Figure()
+                    fig_rev.add_trace(go.Bar(x=df_h.period, y=df_h.revenue_inc/1e6,
+                                             name="수익증분(백만$)", marker_color="rgba(79,195,247,0.8)"))
+                    fig_rev.add_trace(go.Scatter(x=df_h.period, y=df_h.sales_inc/1e6,
+                                                 name="판매증분(백만장)", yaxis="y2",
+                                                 line=dict(color="#ff7043",width=2)))
+                    fig_rev.update_layout(yaxis=dict(title="수익(백만$)"),
+                                          yaxis2=dict(title="판매(백만장)",overlaying="y",side="right"),
+                                          height=340, plot_bgcolor="#0e1117",
+                                          paper_bgcolor="#0e1117", font=dict(color="white"),
+                                          title="연도별 수익·판매 증분")
+                    figs["history_revenue"] = fig_rev
                 st.plotly_chart(fig_rev, width='stretch')
 
             with col2:
-                fig_ccu = go.Figure()
-                fig_ccu.add_trace(go.Scatter(x=df_h.period, y=df_h.avg_ccu,
-                                              name="평균CCU", fill="tozeroy",
-                                              fillcolor="rgba(79,195,247,0.15)",
-                                              line=dict(color="#4fc3f7",width=2)))
-                fig_ccu.update_layout(yaxis_title="평균 CCU", height=340,
-                                      plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                      font=dict(color="white"), title="연도별 평균 CCU")
+                fig_ccu = figs.get("history_ccu")
+                if fig_ccu is None:
+                    fig_ccu = go.Figure()
+                    fig_ccu.add_trace(go.Scatter(x=df_h.period, y=df_h.avg_ccu,
+                                                  name="평균CCU", fill="tozeroy",
+                                                  fillcolor="rgba(79,195,247,0.15)",
+                                                  line=dict(color="#4fc3f7",width=2)))
+                    fig_ccu.update_layout(yaxis_title="평균 CCU", height=340,
+                                          plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                          font=dict(color="white"), title="연도별 평균 CCU")
+                    figs["history_ccu"] = fig_ccu
                 st.plotly_chart(fig_ccu, width='stretch')
 
             col3, col4 = st.columns(2)
             with col3:
-                fig_sc = go.Figure(go.Scatter(x=df_h.period, y=df_h.avg_score,
-                                              line=dict(color="#a5d6a7",width=2),
-                                              mode="lines+markers", fill="tozeroy",
-                                              fillcolor="rgba(165,214,167,0.1)"))
-                fig_sc.update_layout(yaxis_title="평균 리뷰 점수", height=300,
-                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                     font=dict(color="white"), title="연도별 평균 리뷰 점수")
+                fig_sc = figs.get("history_score")
+                if fig_sc is None:
+                    fig_sc = go.Figure(go.Scatter(x=df_h.period, y=df_h.avg_score,
+                                                  line=dict(color="#a5d6a7",width=2),
+                                                  mode="lines+markers", fill="tozeroy",
+                                                  fillcolor="rgba(165,214,167,0.1)"))
+                    fig_sc.update_layout(yaxis_title="평균 리뷰 점수", height=300,
+                                         plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                         font=dict(color="white"), title="연도별 평균 리뷰 점수")
+                    figs["history_score"] = fig_sc
                 st.plotly_chart(fig_sc, width='stretch')
 
             with col4:
-                fig_pr = go.Figure(go.Scatter(x=df_h.period, y=df_h.avg_price,
-                                              line=dict(color="#ce93d8",width=2),
-                                              mode="lines+markers"))
-                fig_pr.update_layout(yaxis_title="평균 가격 ($)", height=300,
-                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
-                                     font=dict(color="white"), title="연도별 평균 가격")
+                fig_pr = figs.get("history_price")
+                if fig_pr is None:
+                    fig_pr = go.Figure(go.Scatter(x=df_h.period, y=df_h.avg_price,
+                                                  line=dict(color="#ce93d8",width=2),
+                                                  mode="lines+markers"))
+                    fig_pr.update_layout(yaxis_title="평균 가격 ($)", height=300,
+                                         plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
+                                         font=dict(color="white"), title="연도별 평균 가격")
+                    figs["history_price"] = fig_pr
                 st.plotly_chart(fig_pr, width='stretch')
 
 # ── 국가별 분포 ───────────────────────────────────────────
 if show_country and "🌍 국가별 분포" in tab_map:
-    with tab_map["🌍 국가별 분포"]:
+    @st.fragment
+    def _country_tab():
         st.subheader("타겟 시장 국가별 분포")
         weight_opt = st.radio("가중 기준", ["revenue","sales","equal"], horizontal=True,
                               format_func=lambda x: {"revenue":"수익가중","sales":"판매가중","equal":"동일가중"}.get(x,x))
         countries = get_country_aggregate(filtered, weight_by=weight_opt)
         if countries:
-            names = list(countries.keys())[:20]
-            pcts  = [countries[n] for n in names]
+            top20 = list(islice(countries.items(), 20))
+            names = [n for n, _ in top20]
+            pcts  = [p for _, p in top20]
             col1, col2 = st.columns(2)
             with col1:
-                fig_c = go.Figure(go.Bar(x=pcts[::-1], y=names[::-1],
+                fig_c = go.Figure(go.Bar(x=pcts, y=names,
                                          orientation="h", marker_color="rgba(79,195,247,0.8)"))
-                fig_c.update_layout(xaxis_title="비율 (%)", height=500,
+                fig_c.update_layout(xaxis_title="비율 (%)", yaxis_autorange="reversed", height=500,
                                     plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
                                     font=dict(color="white"))
                 st.plotly_chart(fig_c, width='stretch')
@@ -339,9 +401,13 @@ if show_country and "🌍 국가별 분포" in tab_map:
                 st.plotly_chart(fig_p, width='stretch')
             st.info(f"💡 **주요 시장**: {', '.join(names[:5])} — 이 장르 성공작 유저의 주요 국가입니다.")
 
+    with tab_map["🌍 국가별 분포"]:
+        _country_tab()
+
 # ── 유저 겹침 ─────────────────────────────────────────────
 if show_overlap and "🔗 유저 겹침" in tab_map:
-    with tab_map["🔗 유저 겹침"]:
+    @st.fragment
+    def _overlap_tab():
         st.subheader("경쟁·연관 게임 유저 겹침 분석")
         st.caption(
             "성공 벤치마크 게임들과 유저를 공유하는 외부 게임. "
@@ -365,57 +431,59 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
         if not overlaps:
             st.info("겹침 데이터가 부족합니다.")
         else:
-            ol_rows = []
-            for o in overlaps:
-                reach_m = o["reach_score"] / 1_000_000
-                copies_m = o["copies_sold"] / 1_000_000
-                ol_rows.append({
-                    "게임명": o["name"],
-                    "유저 겹침 지수 (Link)": f"{o['avg_link']:.3f}",
-                    "외부 게임 판매량(M)": f"{copies_m:.1f}",
-                    "추정 공유 유저(M)": f"{reach_m:.2f}",
-                    "겹침 광범위성": f"{o['overlap_pct']}%",
-                    "장르": ", ".join(o["genres"][:3]) if o["genres"] else "-",
-                })
-            st.dataframe(pd.DataFrame(ol_rows), use_container_width=True, hide_index=True)
+            # 표·차트 공용 컬럼 (수치 배열 그대로 Plotly에 전달)
+            ol_df = pd.DataFrame(overlaps)
+            ol_df["copies_m"] = ol_df["copies_sold"] / 1_000_000
+            ol_df["reach_m"] = ol_df["reach_score"] / 1_000_000
+
+            st.dataframe(
+                pd.DataFrame({
+                    "게임명": ol_df["name"],
+                    "유저 겹침 지수 (Link)": ol_df["avg_link"],
+                    "외부 게임 판매량(M)": ol_df["copies_m"],
+                    "추정 공유 유저(M)": ol_df["reach_m"],
+                    "겹침 광범위성": ol_df["overlap_pct"].map("{:g}%".format),
+                    "장르": [", ".join(g[:3]) if g else "-" for g in ol_df["genres"]],
+                }),
+                use_container_width=True, hide_index=True,
+                column_config={
+                    "유저 겹침 지수 (Link)": st.column_config.NumberColumn(format="%.3f"),
+                    "외부 게임 판매량(M)": st.column_config.NumberColumn(format="%.1f"),
+                    "추정 공유 유저(M)": st.column_config.NumberColumn(format="%.2f"),
+                },
+            )
             st.caption("겹침 광범위성: 벤치마크 게임 중 해당 외부 게임을 audienceOverlap에 포함하는 비율.")
 
             # ── 버블 차트 ──────────────────────────────────────
             st.markdown("#### 타겟 유저 맵 — Link × 유저 규모")
             st.caption("오른쪽 위(고Link + 대규모)일수록 진입 시 공략해야 할 핵심 타겟 플레이어 풀")
 
-            import math
-            bubble_data = [o for o in overlaps if o["copies_sold"] > 0]
-            if bubble_data:
-                max_reach = max(o["reach_score"] for o in bubble_data) or 1
+            bubble = ol_df[ol_df["copies_sold"] > 0]
+            if not bubble.empty:
+                reach = bubble["reach_score"].to_numpy(dtype=np.float64)
                 fig_bubble = go.Figure(go.Scatter(
-                    x=[o["avg_link"] for o in bubble_data],
-                    y=[o["copies_sold"] / 1_000_000 for o in bubble_data],
+                    x=bubble["avg_link"].to_numpy(),
+                    y=bubble["copies_m"].to_numpy(),
                     mode="markers+text",
-                    text=[o["name"][:20] for o in bubble_data],
+                    text=bubble["name"].str[:20].tolist(),
                     textposition="top center",
                     textfont=dict(size=9, color="rgba(255,255,255,0.7)"),
                     marker=dict(
-                        size=[max(8, min(50, o["reach_score"] / max_reach * 50)) for o in bubble_data],
-                        color=[o["avg_link"] for o in bubble_data],
+                        size=np.clip(reach / (reach.max() or 1) * 50, 8, 50),
+                        color=bubble["avg_link"].to_numpy(),
                         colorscale="YlOrRd",
                         showscale=True,
                         colorbar=dict(title="Link"),
                         line=dict(width=1, color="rgba(255,255,255,0.3)"),
                     ),
-                    customdata=[[
-                        o["name"],
-                        f"{o['avg_link']:.3f}",
-                        f"{o['copies_sold']/1e6:.1f}M",
-                        f"{o['reach_score']/1e6:.2f}M",
-                        f"{o['overlap_pct']}%",
-                    ] for o in bubble_data],
+                    hovertext=bubble["name"].tolist(),
+                    customdata=bubble[["avg_link", "copies_m", "reach_m", "overlap_pct"]].to_numpy(dtype=np.float64),
                     hovertemplate=(
-                        "<b>%{customdata[0]}</b><br>"
-                        "Link: %{customdata[1]}<br>"
-                        "판매량: %{customdata[2]}<br>"
-                        "추정 공유 유저: %{customdata[3]}<br>"
-                        "겹침 광범위성: %{customdata[4]}<extra></extra>"
+                        "<b>%{hovertext}</b><br>"
+                        "Link: %{customdata[0]:.3f}<br>"
+                        "판매량: %{customdata[1]:.1f}M<br>"
+                        "추정 공유 유저: %{customdata[2]:.2f}M<br>"
+                        "겹침 광범위성: %{customdata[3]}%<extra></extra>"
                     ),
                 ))
                 fig_bubble.update_layout(
@@ -430,25 +498,28 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
                 st.plotly_chart(fig_bubble, width='stretch')
 
             # ── 바 차트: 추정 공유 유저 순 ──────────────────────
-            top15 = sorted(overlaps, key=lambda x: x["reach_score"], reverse=True)[:15]
+            # reach_score 정렬이면 이미 내림차순 → 앞 15개, 아니면 상위 15개만 선택 (동률은 앞 순서)
+            top15 = (ol_df.head(15) if ol_sort == "reach_score"
+                     else ol_df.nlargest(15, "reach_score"))
             fig_bar = go.Figure(go.Bar(
-                x=[o["reach_score"] / 1_000_000 for o in top15][::-1],
-                y=[o["name"][:25] for o in top15][::-1],
+                x=top15["reach_m"].to_numpy(),
+                y=top15["name"].str[:25].tolist(),
                 orientation="h",
                 marker=dict(
-                    color=[o["avg_link"] for o in top15][::-1],
+                    color=top15["avg_link"].to_numpy(),
                     colorscale="YlOrRd",
                     showscale=True,
                     colorbar=dict(title="Link"),
                 ),
-                customdata=[[f"{o['avg_link']:.3f}", f"{o['copies_sold']/1e6:.1f}M"] for o in top15][::-1],
+                customdata=top15[["avg_link", "copies_m"]].to_numpy(dtype=np.float64),
                 hovertemplate=(
                     "<b>%{y}</b><br>추정 공유 유저: %{x:.2f}M<br>"
-                    "Link: %{customdata[0]}<br>판매량: %{customdata[1]}<extra></extra>"
+                    "Link: %{customdata[0]:.3f}<br>판매량: %{customdata[1]:.1f}M<extra></extra>"
                 ),
             ))
             fig_bar.update_layout(
                 xaxis_title="추정 공유 유저 (백만 명)",
+                yaxis_autorange="reversed",
                 height=440,
                 plot_bgcolor="#0e1117",
                 paper_bgcolor="#0e1117",
@@ -456,6 +527,9 @@ if show_overlap and "🔗 유저 겹침" in tab_map:
             )
             st.plotly_chart(fig_bar, width='stretch')
 
+    with tab_map["🔗 유저 겹침"]:
+        _overlap_tab()
+
 # ── AI 전략 가이드 ────────────────────────────────────────
 with tab_map["🤖 AI 전략 가이드"]:
     st.subheader("Claude AI 개발 전략 가이드")
@@ -465,19 +539,54 @@ with tab_map["🤖 AI 전략 가이드"]:
     if not ok:
         st.error(f"Claude API 키 미설정: {msg}")
     else:
-        if st.button("🔍 AI 전략 가이드 생성", type="primary"):
-            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25)
+        col_run, col_batch = st.columns(2)
+        run_now = col_run.button("🔍 AI 전략 가이드 생성", type="primary")
+        queue_batch = col_batch.button("📨 배치로 제출 (비용 50% 절감, 최대 24시간)",
+                                       help="실시간 스트리밍 없이 Message Batches API로 생성. "
+                                            "이 탭을 연 채로 '배치 상태 확인'을 눌러 결과를 확인합니다 (새로고침 시 배치 정보 사라짐).")
+        if run_now or queue_batch:
+            data_summary = summarize_full_for_claude(filtered, selected_metrics, max_games=25) if selected_metrics else ""
             prompt = build_dev_guide_prompt(
                 target=selected, scale=scale, extra_conditions=extra,
-                games=filtered, price_data=get_price_buckets(filtered),
-                common_tags=get_common_tags(filtered, 15), user_question=user_question,
+                games=filtered, price_data=price_data,
+                common_tags=common_tags, user_question=user_question,
+                extra_data=data_summary,
             )
-            if selected_metrics:
-                prompt = prompt.replace("## 분석 요청", f"## 추가 데이터\n{data_summary}\n\n## 분석 요청")
 
+        if run_now:
             placeholder = st.empty()
-            full_text = ""
             with st.spinner("Claude AI 전략 가이드 생성 중..."):
-                for chunk in stream_analysis(prompt, SYSTEM_PROMPT):
-                    full_text += chunk
+                for full_text in accumulate_stream(stream_analysis(prompt, SYSTEM_PROMPT)):
                     placeholder.markdown(full_text)
+        elif queue_batch:
+            try:
+                st.session_state["guide_batch"] = {
+                    "id": submit_batch(prompt, SYSTEM_PROMPT), "prompt": prompt, "label": selected_label,
+                    "result": None, "error": None,
+                }
+            except RuntimeError as e:
+                st.error(str(e))
+
+        # 제출한 배치: '배치 상태 확인'을 누를 때만 조회 (다른 위젯 재실행마다 API 호출하지 않도록)
+        batch = st.session_state.get("guide_batch")
+        if batch and not run_now:
+            pending = batch["result"] is None and batch["error"] is None
+            col_check, col_clear = st.columns(2)
+            check = col_check.button("🔄 배치 상태 확인", disabled=not pending)
+            if col_clear.button("🗑 배치 지우기"):
+                del st.session_state["guide_batch"]
+                st.rerun()
+            if check:
+                try:
+                    batch["result"] = get_batch_result(batch["id"], batch["prompt"], SYSTEM_PROMPT)
+                except RuntimeError as e:
+                    batch["error"] = str(e)
+
+            if batch["error"]:
+                st.error(f"{batch['error']} (배치 ID: {batch['id']}) — 배치를 지우거나 다시 제출하세요.")
+            elif batch["result"] is None:
+                st.info(f"⏳ 배치 처리 중: {batch['label']} (ID: {batch['id']}) — "
+                        "이 탭을 연 채로 '배치 상태 확인'을 눌러 확인하세요.")
+            else:
+                st.caption(f"📨 배치 결과: {batch['label']}")
+                st.markdown(batch["result"])
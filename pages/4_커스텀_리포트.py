@@ -2,15 +2,16 @@
 프롬프트 기반 커스텀 HTML 리포트 생성 페이지
 기본 지표 + 유저 활동 / 시계열 히스토리 / 국가별 데이터 / 유저 겹침 선택 가능
 """
-import sys, os, math, re
+import sys, os, math, re, time
 import urllib.request
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import heapq
 from datetime import datetime
+from itertools import islice
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
 import streamlit as st
 import streamlit.components.v1 as components
 from dotenv import load_dotenv
@@ -72,7 +73,7 @@ def _generate_plotly_charts(analysis_games: list, yearly_trends: dict) -> str:
     figs = []
 
     # 1. 상위 10개 게임 수익 바차트
-    top10 = sorted(analysis_games, key=lambda x: x.get("revenue") or 0, reverse=True)[:10]
+    top10 = get_top_games(analysis_games, 10, "revenue")
     if top10:
         names  = [g.get("name", "?")[:30] for g in reversed(top10)]
         revs   = [(g.get("revenue") or 0) / 1e6 for g in reversed(top10)]
@@ -92,7 +93,7 @@ def _generate_plotly_charts(analysis_games: list, yearly_trends: dict) -> str:
         for genre in (g.get("genres") or [])[:2]:
             genre_rev[genre] += (g.get("revenue") or 0)
     if genre_rev:
-        top_g = sorted(genre_rev.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_g = heapq.nlargest(10, genre_rev.items(), key=lambda x: x[1])
         fig = go.Figure(go.Pie(
             labels=[g for g, _ in top_g], values=[v for _, v in top_g],
             hole=0.38, textinfo="label+percent",
@@ -160,10 +161,11 @@ def _generate_plotly_charts(analysis_games: list, yearly_trends: dict) -> str:
 st.set_page_config(page_title="커스텀 리포트", page_icon="📋", layout="wide")
 
 from analysis.data_loader import (
-    load_all_games, filter_games, get_all_tags, get_all_genres,
+    load_all_games, filter_games, get_all_tags, get_all_genres, get_playtime_distribution,
+    get_numeric_columns, get_histogram, get_top_games,
     get_yearly_trends, get_activity_summary,
-    get_history_aggregate, get_country_aggregate,
-    get_audience_overlap_top, summarize_full_for_claude, _parse_field,
+    get_history_aggregate_df, get_country_aggregate,
+    get_audience_overlap_top, summarize_full_for_claude, _release_year,
 )
 from analysis.claude_client import stream_report, check_api_key
 from analysis.prompts import SYSTEM_PROMPT_REPORT, build_custom_report_prompt
@@ -174,9 +176,12 @@ all_tags       = get_all_tags(games, min_count=3)
 all_genres     = get_all_genres(games)
 all_game_names = sorted({g.get("name","") for g in games if g.get("name")})
 
-all_sales = [g.get("copiesSold") or 0 for g in games]
-SALES_MIN = int(min(all_sales))
-SALES_MAX = int(max(all_sales))
+all_sales = get_numeric_columns(games, ["copiesSold"])["copiesSold"]
+SALES_MIN = int(all_sales.min())
+SALES_MAX = int(all_sales.max())
+
+# 리포트 생성 중 HTML 소스 미리보기 갱신 간격 (스트림 청크 수)
+LIVE_REFRESH_CHUNKS = 200
 
 # ── 헤더 ─────────────────────────────────────────────────
 st.title("📋 커스텀 AI 리포트 생성기")
@@ -395,15 +400,13 @@ st.divider()
 def apply_filters():
     result = games
     if selected_games:
-        result = [g for g in result if g.get("name") in selected_games]
+        names = set(selected_games)
+        result = [g for g in result if g.get("name") in names]
     else:
-        if selected_genres:
-            result = filter_games(result, genres=selected_genres)
-        if selected_tags:
-            result = filter_games(result, tags=selected_tags)
-        result = filter_games(result, year_min=year_min_input, year_max=year_max_input)
-        result = [g for g in result
-                  if sold_min_input <= (g.get("copiesSold") or 0) <= sold_max_input]
+        # 장르·태그(역색인)·연도·판매량 조건을 한 번의 마스크 연산으로 결합
+        result = filter_games(result, genres=selected_genres, tags=selected_tags,
+                              year_min=year_min_input, year_max=year_max_input,
+                              sold_min=sold_min_input, sold_max=sold_max_input)
 
     parts = []
     if selected_games:
@@ -449,9 +452,8 @@ with st.expander(
         # ── 게임 목록 탭 ─────────────────────────────────
         with ptab["📋 게임 목록"]:
             preview_rows = []
-            for g in sorted(filtered, key=lambda x: x.get("revenue") or 0, reverse=True)[:15]:
-                ts = g.get("releaseDate") or g.get("firstReleaseDate")
-                yr = datetime.fromtimestamp(int(ts)/1000).year if ts else "?"
+            for g in get_top_games(filtered, 15, "revenue"):
+                yr = _release_year(g) or "?"
                 row = {"게임명": g.get("name","?"), "출시": yr,
                        "장르": ", ".join((g.get("genres") or [])[:2]),
                        "태그": ", ".join((g.get("tags") or [])[:3])}
@@ -494,13 +496,15 @@ with st.expander(
                     a_cols[i].metric(label, f"{val:,.0f}{unit}")
 
                 col1, col2, col3 = st.columns(3)
+                act_cols = get_numeric_columns(filtered, ["wishlists", "reviewScore"])
 
                 with col1:
                     # 위시리스트 분포
-                    wish_vals = [g.get("wishlists") or 0 for g in filtered if (g.get("wishlists") or 0) > 0]
-                    if wish_vals:
-                        fig = go.Figure(go.Histogram(
-                            x=[v/1000 for v in wish_vals], nbinsx=25,
+                    wish_vals = act_cols["wishlists"][act_cols["wishlists"] > 0]
+                    if len(wish_vals):
+                        centers, counts, width = get_histogram(wish_vals / 1000, 25)
+                        fig = go.Figure(go.Bar(
+                            x=centers, y=counts, width=width,
                             marker_color="rgba(79,195,247,0.8)"))
                         fig.update_layout(xaxis_title="위시리스트 (천)", yaxis_title="게임 수",
                             height=250, margin=dict(t=30,b=30), title="위시리스트 분포",
@@ -510,17 +514,11 @@ with st.expander(
 
                 with col2:
                     # 플레이타임 구간 비율
-                    bucket_sums = {}; cnt = 0
-                    for g in filtered:
-                        dist = (_parse_field(g.get("playtimeData"), default={}) or {}).get("distribution") or {}
-                        if dist:
-                            for b, pct in dist.items():
-                                bucket_sums[b] = bucket_sums.get(b, 0) + pct
-                            cnt += 1
-                    if bucket_sums and cnt:
+                    pt_dist = get_playtime_distribution(filtered)
+                    if pt_dist:
                         order = ["0-1h","1-2h","2-5h","5-10h","10-20h","20-50h","50-100h","100-500h"]
-                        bkts = [b for b in order if b in bucket_sums]
-                        avgs = [round(bucket_sums[b]/cnt, 1) for b in bkts]
+                        bkts = [b for b in order if b in pt_dist]
+                        avgs = [round(pt_dist[b], 1) for b in bkts]
                         fig = go.Figure(go.Bar(x=bkts, y=avgs,
                                                marker_color="rgba(255,183,77,0.8)"))
                         fig.update_layout(xaxis_title="플레이타임 구간",
@@ -532,10 +530,11 @@ with st.expander(
 
                 with col3:
                     # 리뷰점수 분포
-                    scores = [g.get("reviewScore") or 0 for g in filtered if g.get("reviewScore")]
-                    if scores:
-                        fig = go.Figure(go.Histogram(x=scores, nbinsx=20,
-                                                      marker_color="rgba(165,214,167,0.8)"))
+                    scores = act_cols["reviewScore"][act_cols["reviewScore"] != 0]
+                    if len(scores):
+                        centers, counts, width = get_histogram(scores, 20)
+                        fig = go.Figure(go.Bar(x=centers, y=counts, width=width,
+                                               marker_color="rgba(165,214,167,0.8)"))
                         fig.update_layout(xaxis_title="리뷰 점수", yaxis_title="게임 수",
                             height=250, margin=dict(t=30,b=30), title="리뷰점수 분포",
                             plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
@@ -543,7 +542,7 @@ with st.expander(
                         st.plotly_chart(fig, width='stretch')
 
                 # 팔로워 상위 10
-                top10 = sorted(filtered, key=lambda x: x.get("followers") or 0, reverse=True)[:10]
+                top10 = get_top_games(filtered, 10, "followers")
                 rows = [{"게임명": g.get("name",""),
                          "플레이타임(h)": f"{(g.get('avgPlaytime') or 0):.1f}".rstrip('0').rstrip('.'),
                          "리뷰점수": g.get("reviewScore") or 0,
@@ -555,11 +554,10 @@ with st.expander(
         # ── 시계열 탭 ────────────────────────────────────
         if inc_history and "📅 시계열" in ptab:
             with ptab["📅 시계열"]:
-                hist = get_history_aggregate(filtered, freq="yearly")
-                if not hist:
+                df_h = get_history_aggregate_df(filtered, freq="yearly")
+                if df_h.empty:
                     st.info("히스토리 데이터가 없습니다.")
                 else:
-                    df_h = pd.DataFrame([{"period": p, **v} for p, v in hist.items()])
 
                     h_tabs = st.tabs(["수익·판매", "CCU", "점수·플레이타임", "가격·팔로워"])
 
@@ -650,14 +648,15 @@ with st.expander(
                     key="prev_country_weight")
                 countries = get_country_aggregate(filtered, weight_by=weight)
                 if countries:
-                    names = list(countries.keys())[:20]
-                    pcts  = [countries[n] for n in names]
+                    top20 = list(islice(countries.items(), 20))
+                    names = [n for n, _ in top20]
+                    pcts  = [p for _, p in top20]
                     col1, col2 = st.columns(2)
                     with col1:
                         fig = go.Figure(go.Bar(
-                            x=pcts[::-1], y=names[::-1], orientation="h",
+                            x=pcts, y=names, orientation="h",
                             marker_color="rgba(79,195,247,0.8)"))
-                        fig.update_layout(xaxis_title="비율 (%)", height=460,
+                        fig.update_layout(xaxis_title="비율 (%)", yaxis_autorange="reversed", height=460,
                             plot_bgcolor="#0e1117", paper_bgcolor="#0e1117",
                             font=dict(color="white"))
                         st.plotly_chart(fig, width='stretch')
@@ -693,10 +692,9 @@ with st.expander(
                     st.dataframe(pd.DataFrame(ol_rows), use_container_width=True, hide_index=True)
 
                     # 버블 차트
-                    import math as _math
                     bubble_data = [o for o in overlaps if o["copies_sold"] > 0]
                     if bubble_data:
-                        max_reach = max(o["reach_score"] for o in bubble_data) or 1
+                        reach = np.array([o["reach_score"] for o in bubble_data], dtype=np.float64)
                         fig_b = go.Figure(go.Scatter(
                             x=[o["avg_link"] for o in bubble_data],
                             y=[o["copies_sold"] / 1_000_000 for o in bubble_data],
@@ -705,7 +703,7 @@ with st.expander(
                             textposition="top center",
                             textfont=dict(size=9, color="rgba(255,255,255,0.7)"),
                             marker=dict(
-                                size=[max(8, min(50, o["reach_score"] / max_reach * 50)) for o in bubble_data],
+                                size=np.clip(reach / (reach.max() or 1) * 50, 8, 50),
                                 color=[o["avg_link"] for o in bubble_data],
                                 colorscale="YlOrRd", showscale=True,
                                 colorbar=dict(title="Link"),
@@ -826,7 +824,7 @@ if generate_btn:
     # 최대 200개로 제한 (프롬프트 토큰 관리)
     if len(filtered) > 200:
         st.info(f"데이터가 많아 수익 기준 상위 200개로 분석합니다. (전체: {len(filtered)}개)")
-        analysis_games = sorted(filtered, key=lambda x: x.get("revenue") or 0, reverse=True)[:200]
+        analysis_games = get_top_games(filtered, 200, "revenue")
     else:
         analysis_games = filtered
 
@@ -868,14 +866,26 @@ if generate_btn:
     status = st.empty()
     status.info("Claude AI가 HTML 리포트를 생성 중입니다... (60~90초 소요)")
     prog = st.progress(0)
+    live_src = st.empty()
 
     try:
         chunks = []
+        started = time.time()
         for i, chunk in enumerate(stream_report(base_prompt, active_system_prompt)):
             chunks.append(chunk)
             prog.progress(min(i / 300, 0.95))
+            # 생성 중인 HTML 소스·속도 표시 (매 청크 렌더링은 비용이 커서 일정 간격으로만 갱신)
+            if i % LIVE_REFRESH_CHUNKS == 0:
+                html_so_far = "".join(chunks)
+                elapsed = max(time.time() - started, 1e-3)
+                status.info(
+                    f"Claude AI가 HTML 리포트를 생성 중입니다... "
+                    f"{len(html_so_far):,} 글자 ({len(html_so_far) / elapsed:,.0f} 글자/초)"
+                )
+                live_src.code(html_so_far, language="html")
 
         full_html = "".join(chunks)
+        live_src.empty()
         prog.progress(1.0)
         status.success(f"리포트 생성 완료! ({len(full_html):,} 글자)")
 
@@ -905,6 +915,7 @@ if generate_btn:
 
     except Exception as e:
         prog.empty()
+        live_src.empty()
         status.error(f"리포트 생성 실패: {e}")
 
 # ════════════════════════════════════════════════════════